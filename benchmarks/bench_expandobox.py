@@ -0,0 +1,299 @@
+"""
+Benchmarks of ExpandoBox operations across catalog sizes.
+
+Runs headless (Qt's offscreen platform, unless QT_QPA_PLATFORM is set),
+and writes timings as JSON, to compare between versions:
+
+    python benchmarks/bench_expandobox.py -o before.json
+    python benchmarks/bench_expandobox.py -o after.json --compare before.json
+
+Each operation is timed `repeat` times (with any setup untimed); results
+keep every time, with their minimum and median. Defaults are a tenth of
+each catalog, extras the rest.
+"""
+
+# stdlib
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+from statistics import median
+from datetime import datetime, timezone
+# pypi
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from qtpy import API_NAME, QT_VERSION
+from qtpy.QtCore import Qt
+from qtpy.QtWidgets import QApplication
+# local
+from pycuties.expandobox import ExpandoBox
+from pycuties.completion import PrefixEngine
+# type hints
+from typing import (Callable as Callable_T,
+                    Dict as Dict_T,
+                    List as List_T,
+                    Optional as Optional_T,
+                    Tuple as Tuple_T)
+
+
+# --- Utility ---
+
+SIZES = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+BATCH = 100  # items per bulk add|remove
+GROUPS = 100  # groups of extras, when grouped
+
+
+def get_items(n_items: int) -> Tuple_T[List_T[str], List_T[str]]:
+    n_defaults = max(1, n_items // 10)
+    defaults = [f'default {i_item}' for i_item in range(n_defaults)]
+    extras = [f'extra {i_item}' for i_item in range(n_items - n_defaults)]
+    return defaults, extras
+
+
+def timed(run: Callable_T[[], object],
+          repeat: int,
+          setup: Callable_T[[], object] = None,
+          ) -> List_T[float]:
+    """Seconds per call of run, each after an (untimed) call of setup."""
+    times = list()
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def settle() -> None:
+    QApplication.processEvents()
+
+
+# --- Operations ---
+
+def bench_size(n_items: int,
+               repeat: int,
+               selected: Optional_T[List_T[str]] = None,
+               ) -> Dict_T[str, List_T[float]]:
+    """operation -> times, for one catalog size."""
+    defaults, extras = get_items(n_items)
+    results = dict()
+
+    def bench(operation: str, *args, **kwargs) -> None:
+        if selected is None or operation in selected:
+            results[operation] = timed(*args, **kwargs)
+            print(f'{n_items:>9}  {operation:<22} {min(results[operation]) * 1e3:10.3f} ms',
+                  file=sys.stderr)
+
+    # construction (one box per run, deleted after)
+    boxes = list()
+    bench('construct',
+          lambda: boxes.append(ExpandoBox(defaults=defaults, extras=extras)),
+          repeat,
+          setup=lambda: boxes.clear())
+    engine_boxes = list()
+    bench('construct_completion',
+          lambda: engine_boxes.append(ExpandoBox(defaults=defaults, extras=extras,
+                                                 completion=PrefixEngine())),
+          repeat,
+          setup=lambda: engine_boxes.clear())
+    xbox = ExpandoBox(defaults=defaults, extras=extras)
+    expander = len(defaults)
+
+    # expansion (idempotent, so each run starts from the state its setup gives)
+    def expand() -> None:
+        if not xbox._is_expanded:
+            xbox.toggleExtras()
+            xbox._is_expanded = True
+
+    def collapse() -> None:
+        if xbox._is_expanded:
+            xbox.toggleExtras()
+            xbox._is_expanded = False
+
+    bench('toggleExtras_expand', expand, repeat, setup=collapse)
+    bench('toggleExtras_collapse', collapse, repeat, setup=expand)
+    collapse()
+
+    # selection, with history
+    i_select = iter(range(10 ** 9))
+
+    def select() -> None:
+        xbox.onSelect(expander + 1 + next(i_select) % len(extras))
+
+    bench('onSelect_history', select, repeat, setup=expand)
+
+    # popup
+    def show() -> None:
+        xbox.showPopup()
+        xbox.view().viewport().grab()  # paint
+        settle()
+
+    bench('popup_collapsed', show, repeat, setup=xbox.hidePopup)
+    bench('popup_expanded', show, repeat, setup=lambda: (xbox.hidePopup(), expand()))
+    xbox.hidePopup()
+    collapse()
+
+    # completion
+    completer = xbox.completer()
+
+    def complete_filter() -> None:
+        completer.setCompletionPrefix('extra 12')
+        completer.completionCount()
+
+    def reset_filter() -> None:
+        completer.setCompletionPrefix('')
+        # drop QCompleter's cache of filtered prefixes (a new engine is made on any change)
+        sensitivity = completer.caseSensitivity()
+        completer.setCaseSensitivity(Qt.CaseSensitive if sensitivity == Qt.CaseInsensitive
+                                     else Qt.CaseInsensitive)
+        completer.setCaseSensitivity(sensitivity)
+
+    bench('completion_qcompleter', complete_filter, repeat, setup=reset_filter)
+    if engine_boxes:
+        engine_box = engine_boxes[-1]
+        bench('completion_engine', lambda: engine_box.updateCompletions('extra 12'), repeat)
+
+    # grouped extras (GROUPS groups): expansion shows headers, opening a group its rows
+    grouped = {f'group {i_group}': extras[i_group::GROUPS] for i_group in range(GROUPS)}
+    group_box = ExpandoBox(defaults=defaults, extras=grouped)
+
+    def expand_grouped() -> None:
+        group_box.toggleExtras()
+        group_box._is_expanded = True
+
+    def collapse_grouped() -> None:
+        if group_box._is_expanded:
+            group_box.toggleExtras()
+            group_box._is_expanded = False
+
+    bench('toggleExtras_grouped', expand_grouped, repeat, setup=collapse_grouped)
+    bench('toggleGroup_open', lambda: group_box.toggleGroup(0), repeat,
+          setup=lambda: (collapse_grouped(), expand_grouped()))
+
+    def show_grouped() -> None:
+        group_box.showPopup()
+        group_box.view().viewport().grab()  # paint
+        settle()
+
+    bench('popup_grouped', show_grouped, repeat,
+          setup=lambda: (group_box.hidePopup(), collapse_grouped(), expand_grouped()))
+    group_box.hidePopup()
+
+    # paged extras (n_show_extras at a time)
+    paged_box = ExpandoBox(defaults=defaults, extras=extras, paged=True)
+
+    def expand_paged() -> None:
+        paged_box.toggleExtras()
+        paged_box._is_expanded = True
+
+    def collapse_paged() -> None:
+        if paged_box._is_expanded:
+            paged_box.toggleExtras()
+            paged_box._is_expanded = False
+
+    bench('toggleExtras_paged', expand_paged, repeat, setup=collapse_paged)
+    bench('showMoreExtras', paged_box.showMoreExtras, repeat)
+    collapse_paged()
+
+    # item modification (setup restores the state before, untimed)
+    for segment in ('Default', 'Extra'):
+        add, add_s = getattr(xbox, f'add{segment}'), getattr(xbox, f'add{segment}s')
+        remove, remove_s = getattr(xbox, f'remove{segment}'), getattr(xbox, f'remove{segment}s')
+        text = f'new {segment}'
+        texts = [f'{text} {i_item}' for i_item in range(BATCH)]
+        bench(f'add{segment}', lambda: add(text), repeat,
+              setup=lambda: remove_s([text]))
+        bench(f'remove{segment}', lambda: remove(text), repeat,
+              setup=lambda: add_s([text], skip_repeats=True))
+        bench(f'add{segment}s', lambda: add_s(texts), repeat,
+              setup=lambda: remove_s(texts))
+        bench(f'remove{segment}s', lambda: remove_s(texts), repeat,
+              setup=lambda: add_s(texts, skip_repeats=True))
+    texts = [f'new {i_item}' for i_item in range(BATCH)]
+
+    def mixed() -> None:
+        for text in texts:
+            xbox.addExtra(text)
+        xbox.removeExtras(texts[::2])
+        xbox.clearHistory()
+
+    def mixed_batch() -> None:
+        with xbox.batchUpdate():
+            mixed()
+
+    restore = lambda: (xbox.removeExtras(texts), expand(), select())
+    bench('mixed', mixed, repeat, setup=restore)
+    bench('mixed_batchUpdate', mixed_batch, repeat, setup=restore)
+    xbox.removeExtras(texts)
+    bench('clearHistory', xbox.clearHistory, repeat,
+          setup=lambda: (expand(), select()))
+
+    def refill() -> None:
+        xbox.clearDefaults()
+        xbox.clearExtras()
+        xbox.addDefaults(defaults)
+        xbox.addExtras(extras)
+
+    bench('clearDefaults', xbox.clearDefaults, repeat, setup=refill)
+    bench('clearExtras', xbox.clearExtras, repeat, setup=refill)
+    return results
+
+
+# --- Main ---
+
+def run(sizes: List_T[int],
+        repeat: int,
+        selected: Optional_T[List_T[str]] = None,
+        ) -> dict:
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    results = list()
+    for n_items in sizes:
+        for operation, times in bench_size(n_items, repeat, selected).items():
+            results.append({'operation': operation,
+                            'size': n_items,
+                            'times': times,
+                            'min': min(times),
+                            'median': median(times)})
+    return {'meta': {'date': datetime.now(timezone.utc).isoformat(),
+                     'python': platform.python_version(),
+                     'qt_api': API_NAME,
+                     'qt': QT_VERSION,
+                     'platform': platform.platform(),
+                     'qpa': app.platformName(),
+                     'repeat': repeat},
+            'results': results}
+
+
+def compare(report: dict, baseline: dict) -> None:
+    """Print the median time of each result relative to the baseline's."""
+    before = {(result['operation'], result['size']): result['median']
+              for result in baseline['results']}
+    for result in report['results']:
+        key = (result['operation'], result['size'])
+        if key in before and before[key]:
+            print(f"{result['size']:>9}  {result['operation']:<22} "
+                  f"{result['median'] / before[key]:6.2f}x")
+
+
+def main(argv: List_T[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--operations', nargs='+', default=None,
+                        help='only these operations (default: all)')
+    parser.add_argument('-o', '--output', default='expandobox-benchmarks.json')
+    parser.add_argument('--compare', default=None,
+                        help='baseline JSON, from an earlier run')
+    args = parser.parse_args(argv)
+    report = run(args.sizes, args.repeat, args.operations)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=1)
+    if args.compare is not None:
+        with open(args.compare) as file:
+            compare(report, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Import time of pycuties, and which modules each import loads.
+
+Each statement runs in a fresh interpreter, `repeat` times; results (every
+time, with minimum and median, and the top-level modules it loaded) are
+written as JSON, and compared against a baseline:
+
+    python benchmarks/bench_import.py -o import.json
+    python benchmarks/bench_import.py --compare before.json
+
+pycuties is byte-compiled first, so times exclude compilation. The
+baseline defaults to import-baseline.json, beside this script (update it
+with --record when an import is meant to get heavier). The run fails if a
+statement is slower than the baseline by more than --tolerance, or loads a
+module it did not.
+"""
+
+# stdlib
+import sys
+import json
+import argparse
+import compileall
+import subprocess
+from pathlib import Path
+from statistics import median
+# type hints
+from typing import (Dict as Dict_T,
+                    List as List_T)
+
+
+# --- Measurement ---
+
+STATEMENTS = ('import pycuties',
+              'from pycuties import PrefixEngine',
+              'from pycuties.completion import FuzzyEngine',
+              'from pycuties import ExpandoBox')
+
+BASELINE = Path(__file__).with_name('import-baseline.json')
+
+PROBE = '''
+import sys, time
+before = set(sys.modules)
+start = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - start
+loaded = sorted({{name.split('.')[0] for name in set(sys.modules) - before
+                  if not name.startswith('_')}}
+                | {{name for name in sys.modules if name.startswith('PyQt') and name.count('.') == 1}})
+print(seconds, ' '.join(loaded))
+'''
+
+
+def measure(statement: str, repeat: int) -> Dict_T[str, object]:
+    times = list()
+    modules = list()
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', PROBE.format(statement=statement)],
+                                check=True, stdout=subprocess.PIPE, universal_newlines=True)
+        seconds, *modules = output.stdout.split()
+        times.append(float(seconds))
+    return {'statement': statement,
+            'times': times,
+            'min': min(times),
+            'median': median(times),
+            'qt_modules': [name for name in modules if name.startswith('PyQt')],
+            'modules': modules}
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> bool:
+    """Print each statement's median time relative to the baseline's, and the
+    modules it newly loads; whether any is slower than tolerance or loads more.
+    """
+    before = {result['statement']: result for result in baseline['results']}
+    regressed = False
+    for result in report['results']:
+        previous = before.get(result['statement'])
+        if previous is None:
+            continue
+        ratio = result['median'] / previous['median']
+        added = sorted(set(result['modules']) - set(previous.get('modules', result['modules'])))
+        slower = ratio > tolerance
+        regressed |= slower or bool(added)
+        print(f"{ratio:6.2f}x{' !' if slower else '  '} {result['statement']:<55} "
+              f"{' '.join('+' + name for name in added)}")
+    return regressed
+
+
+def main(argv: List_T[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('-o', '--output', default='pycuties-import.json')
+    parser.add_argument('--compare', default=str(BASELINE),
+                        help='baseline JSON, from an earlier run (default: %(default)s)')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='slowdown relative to the baseline that fails the run')
+    parser.add_argument('--record', action='store_true',
+                        help='write the results as the new baseline, rather than compare')
+    args = parser.parse_args(argv)
+    import pycuties  # (no submodules)
+    compileall.compile_dir(str(Path(pycuties.__file__).parent), quiet=1)
+    results = list()
+    for statement in STATEMENTS:
+        result = measure(statement, args.repeat)
+        results.append(result)
+        print(f"{result['median'] * 1e3:8.1f} ms  {statement:<55} {' '.join(result['qt_modules'])}",
+              file=sys.stderr)
+    report = {'python': sys.version.split()[0], 'repeat': args.repeat, 'results': results}
+    with open(BASELINE if args.record else args.output, 'w') as file:
+        json.dump(report, file, indent=1)
+    if (not args.record
+    and Path(args.compare).exists()):
+        with open(args.compare) as file:
+            if compare(report, json.load(file), args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,44 @@
-from .expandobox import ExpandoBox
+"""
+Qt widgets, imported on first use.
 
-del expandobox
-del icons
+Names below load their submodule (and the Qt modules it needs) when first
+accessed, so e.g. `from pycuties import PrefixEngine` does not load
+QtWidgets.
+"""
 
-__all__ = ['ExpandoBox',]
+# stdlib
+import sys
+from importlib import import_module
+
+
+_modules = {'ExpandoBox': 'expandobox',
+            'ItemCatalog': 'expandobox',
+            'FrozenCatalog': 'expandobox',
+            'CompletionEngine': 'completion',
+            'PrefixEngine': 'completion',
+            'WordStartEngine': 'completion',
+            'FuzzyEngine': 'completion',
+            'Frecency': 'completion',
+            'AsyncCompletion': 'aio',
+            'HistoryStore': 'persist',
+            'Timings': 'timing',}
+
+__all__ = list(_modules)
+
+
+def __getattr__(name: str):
+    module = _modules.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = getattr(import_module(f'.{module}', __name__), name)
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if sys.version_info < (3, 7):  # (no module __getattr__, PEP 562)
+    for name in __all__:
+        globals()[name] = __getattr__(name)
+    del name
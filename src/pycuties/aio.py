@@ -0,0 +1,135 @@
+"""
+asyncio adapters for ExpandoBox item sources.
+
+Async providers of extras pages and completion results are scheduled as
+tasks on the event loop (e.g. one integrated with Qt through qasync).
+Their results are handed back through queued signals, so they are applied
+to models on the GUI thread whichever thread runs the loop. asyncio (and
+inspect) are imported on first use, so boxes without async sources do not
+load them.
+"""
+
+# local
+from pycuties.completion import CompletionEngine
+# type hints
+from typing import (Any as Any_T,
+                    Awaitable as Awaitable_T,
+                    Callable as Callable_T,
+                    Iterable as Iterable_T,
+                    List as List_T,
+                    Union as T_Union,)
+
+
+# --- Scheduling ---
+
+def get_loop() -> 'asyncio.AbstractEventLoop':
+    """The running event loop, else the current thread's (to run later)."""
+    import asyncio  # (deferred: only loaded for async sources)
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.get_event_loop_policy().get_event_loop()
+
+
+def schedule(awaitable: Awaitable_T,
+             callback: Callable_T[[Any_T], None],
+             ) -> 'asyncio.Future':
+    """Run awaitable as a task, passing its result to callback.
+
+    callback is not called if the task is cancelled; if it fails, the error
+    goes to the loop's exception handler and callback receives None.
+    """
+    import asyncio
+    loop = get_loop()
+    future = asyncio.ensure_future(awaitable, loop=loop)
+
+    def done(future: 'asyncio.Future') -> None:
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            loop.call_exception_handler({'message': 'ExpandoBox provider failed',
+                                         'exception': error,
+                                         'future': future})
+        try:
+            callback(None if error is not None else future.result())
+        except RuntimeError:  # receiver deleted
+            pass
+
+    future.add_done_callback(done)
+    return future
+
+
+# --- Sources ---
+
+def is_async_source(source: object) -> bool:
+    if hasattr(source, '__aiter__'):
+        return True
+    from inspect import iscoroutinefunction  # (deferred: only loaded for providers)
+    return iscoroutinefunction(source)
+
+
+def get_async_pager(source: T_Union[Callable_T[[int, int], Awaitable_T[Iterable_T[str]]],
+                                    Any_T],
+                    ) -> Callable_T[[int], Awaitable_T[List_T[str]]]:
+    """Normalise an async extras provider to a coroutine function returning its next page.
+
+    source is either an async function (offset, limit) -> items, or an
+    async iterable of items. A page shorter than its limit is the last.
+    """
+    if hasattr(source, '__aiter__'):
+        iterator = source.__aiter__()
+
+        async def fetch(limit: int) -> List_T[str]:
+            page = list()
+            while len(page) < limit:
+                try:
+                    page.append(await iterator.__anext__())
+                except StopAsyncIteration:
+                    break
+            return page
+
+    else:
+        offset = 0
+
+        async def fetch(limit: int) -> List_T[str]:
+            nonlocal offset
+            page = list(await source(offset, limit))
+            offset += len(page)
+            return page
+
+    return fetch
+
+
+class AsyncCompletion(CompletionEngine):
+    """Completion answered by an async function (text, limit) -> texts.
+
+    The source does its own matching (e.g. a database or service query), so
+    the box's items are not indexed: add, remove and clear do nothing.
+    """
+    def __init__(self, query: Callable_T[[str, int], Awaitable_T[Iterable_T[str]]]) -> None:
+        self._query = query
+
+    def add(self, texts: Iterable_T[str]) -> None:
+        pass
+
+    def remove(self, texts: Iterable_T[str]) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    async def query(self, text: str, limit: int) -> List_T[str]:
+        return list(await self._query(text, limit))[:limit]
+
+
+def as_engine(completion: T_Union[CompletionEngine, Callable_T, None],
+              ) -> T_Union[CompletionEngine, Callable_T, None]:
+    """completion, with an async function (text, limit) -> texts as an AsyncCompletion."""
+    if (completion is None
+    or isinstance(completion, CompletionEngine)):
+        return completion
+    from inspect import iscoroutinefunction  # (deferred: only loaded for functions)
+    if iscoroutinefunction(completion):
+        return AsyncCompletion(completion)
+    return completion
@@ -0,0 +1,396 @@
+"""
+Completion engines for ExpandoBox.
+
+An engine indexes item texts, is kept current by the box as items are added
+or removed, and answers queries with at most `limit` matching texts. The
+box shows only those results in its completer popup. A Frecency scores
+selected texts by how often and how recently they were chosen, to rank
+those results (and history) by use.
+"""
+
+# stdlib
+import re
+from abc import ABC, abstractmethod
+from time import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from heapq import nlargest
+# type hints
+from typing import (Callable as Callable_T,
+                    Dict as Dict_T,
+                    Iterable as Iterable_T,
+                    List as List_T,
+                    Optional as Optional_T,
+                    Tuple as Tuple_T)
+
+
+# --- Base ---
+
+class CompletionEngine(ABC):
+    """Interface for completion engines.
+
+    Texts are counted as a multiset: a text added twice stays completable
+    until it has been removed twice. Query results are distinct texts.
+    """
+    @abstractmethod
+    def add(self, texts: Iterable_T[str]) -> None:
+        ...
+
+    @abstractmethod
+    def remove(self, texts: Iterable_T[str]) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def query(self, text: str, limit: int) -> List_T[str]:
+        ...
+
+
+# --- Prefix ---
+
+class PrefixEngine(CompletionEngine):
+    """Prefix completion over a sorted key array.
+
+    A query bisects to the first key starting with the prefix and reads on
+    until `limit` results or the first non-matching key: O(log n + results).
+    Small batches are inserted in place; large ones are merged by re-sorting.
+    """
+    rebuild_batch = 64  # batch size from which add|remove re-sort rather than bisect
+
+    def __init__(self, case_sensitive: bool = True) -> None:
+        self.caseSensitive = case_sensitive
+        self._counts: Dict_T[str, int] = dict()
+        # parallel, sorted by key
+        self._keys: List_T[str] = list()
+        self._texts: List_T[str] = list()
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __contains__(self, text: str) -> bool:
+        return text in self._counts
+
+    def key(self, text: str) -> str:
+        return text if self.caseSensitive else text.casefold()
+
+    def keys(self, text: str) -> List_T[str]:
+        """Keys under which text is found by prefix."""
+        return [self.key(text)]
+
+    def add(self, texts: Iterable_T[str]) -> None:
+        counts = self._counts
+        new = list()
+        for text in texts:
+            count = counts.get(text, 0)
+            if not count:
+                new.append(text)
+            counts[text] = count + 1
+        if len(new) >= self.rebuild_batch:
+            self._rebuild(counts)
+        else:
+            for text in new:
+                for key in self.keys(text):
+                    i_key = bisect_right(self._keys, key)
+                    self._keys.insert(i_key, key)
+                    self._texts.insert(i_key, text)
+
+    def remove(self, texts: Iterable_T[str]) -> None:
+        counts = self._counts
+        gone = list()
+        for text in texts:
+            count = counts.get(text, 0)
+            if count > 1:
+                counts[text] = count - 1
+            elif count:
+                del counts[text]
+                gone.append(text)
+        if len(gone) >= self.rebuild_batch:
+            self._rebuild(counts)
+        else:
+            for text in gone:
+                for key in self.keys(text):
+                    i_key = bisect_left(self._keys, key)
+                    while self._texts[i_key] != text:
+                        i_key += 1
+                    del self._keys[i_key]
+                    del self._texts[i_key]
+
+    def clear(self) -> None:
+        self._counts.clear()
+        self._keys.clear()
+        self._texts.clear()
+
+    def query(self, text: str, limit: int) -> List_T[str]:
+        prefix = self.key(text)
+        keys = self._keys
+        texts = self._texts
+        n_keys = len(keys)
+        i_key = bisect_left(keys, prefix)
+        results = dict()  # ordered, distinct
+        while (len(results) < limit
+        and i_key < n_keys
+        and keys[i_key].startswith(prefix)):
+            results[texts[i_key]] = None
+            i_key += 1
+        return list(results)
+
+    def _rebuild(self, texts: Iterable_T[str]) -> None:
+        if (self.caseSensitive
+        and type(self).keys is PrefixEngine.keys):
+            self._texts = sorted(texts)
+            self._keys = self._texts.copy()  # keys are the texts
+            return
+        keys = list()
+        keyed = list()
+        for text in texts:
+            text_keys = self.keys(text)
+            keys.extend(text_keys)
+            keyed.extend([text] * len(text_keys))
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self._keys = [keys[i_key] for i_key in order]
+        self._texts = [keyed[i_key] for i_key in order]
+
+
+word_start = re.compile(r'\b\w')
+
+
+class WordStartEngine(PrefixEngine):
+    """Prefix completion from the start of any word after the first.
+
+    "water" finds "fresh water system", via its key "water system".
+    """
+    def keys(self, text: str) -> List_T[str]:
+        key = self.key(text)
+        return [key[match.start():]
+                for match in word_start.finditer(key)
+                if match.start()]
+
+
+# --- Fuzzy ---
+
+PREFIX, WORD_START, SUBSTRING, FUZZY = range(4)
+
+
+def trigrams(text: str) -> List_T[str]:
+    return [text[i_char:i_char + 3] for i_char in range(len(text) - 2)]
+
+
+class FuzzyEngine(CompletionEngine):
+    """Ranked completion: prefix, then word-start, then substring, then fuzzy matches.
+
+    Prefix and word-start matches come from sorted key arrays. Substring and
+    fuzzy matches come from an inverted index of each item's trigrams (over
+    the text padded with a space at either end): a substring match contains
+    all of the query's trigrams, so only the shortest posting list is
+    scanned; a fuzzy match shares at least `min_similarity` of the padded
+    query's trigrams and is ranked by that share. Each tier is only consulted
+    while fewer than `limit` results have been found.
+
+    Removed items are left in posting lists until more than half of all
+    entries are dead, at which point the postings are rebuilt.
+    """
+    def __init__(self,
+                 case_sensitive: bool = False,
+                 min_similarity: float = 0.5,
+                 ) -> None:
+        self.caseSensitive = case_sensitive
+        self.minSimilarity = min_similarity
+        self._prefix = PrefixEngine(case_sensitive)
+        self._word_start = WordStartEngine(case_sensitive)
+        # trigram -> ids, id -> text (None once removed)
+        self._postings: Dict_T[str, array] = dict()
+        self._ids: Dict_T[str, int] = dict()
+        self._texts: List_T[Optional_T[str]] = list()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def key(self, text: str) -> str:
+        return text if self.caseSensitive else text.casefold()
+
+    def add(self, texts: Iterable_T[str]) -> None:
+        texts = list(texts)
+        self._prefix.add(texts)
+        self._word_start.add(texts)
+        self._index(texts)
+
+    def remove(self, texts: Iterable_T[str]) -> None:
+        texts = list(texts)
+        self._prefix.remove(texts)
+        self._word_start.remove(texts)
+        ids = self._ids
+        for text in texts:
+            if (text in ids
+            and text not in self._prefix):  # last copy removed
+                self._texts[ids.pop(text)] = None
+        if len(self._texts) > 2 * len(ids):
+            self._reindex()
+
+    def clear(self) -> None:
+        self._prefix.clear()
+        self._word_start.clear()
+        self._postings.clear()
+        self._ids.clear()
+        self._texts.clear()
+
+    def query(self, text: str, limit: int) -> List_T[str]:
+        return [result for result, _ in self.rank(text, limit)]
+
+    def rank(self, text: str, limit: int) -> List_T[Tuple_T[str, int]]:
+        """Top results as (text, tier) pairs, best first."""
+        results = dict()
+
+        def take(tier: int, candidates: Iterable_T[str]) -> bool:
+            for candidate in candidates:
+                if candidate not in results:
+                    results[candidate] = tier
+                    if len(results) >= limit:
+                        return True
+            return False
+
+        if (take(PREFIX, self._prefix.query(text, limit))
+        or take(WORD_START, self._word_start.query(text, limit))
+        or take(SUBSTRING, self._substrings(self.key(text)))):
+            return list(results.items())
+        take(FUZZY, self._fuzzy(self.key(text), limit - len(results), results))
+        return list(results.items())
+
+    def _substrings(self, key: str) -> Iterable_T[str]:
+        if not key:
+            return
+        texts = self._texts
+        if len(key) >= 3:
+            grams = set(trigrams(key))
+            if not all(gram in self._postings for gram in grams):
+                return
+            postings = [self._postings[gram] for gram in grams]
+        else:
+            postings = [ids
+                        for gram, ids in self._postings.items()
+                        if key in gram]
+        seen = set()
+        for ids in sorted(postings, key=len):
+            for i_text in ids:
+                text = texts[i_text]
+                if (text is not None
+                and i_text not in seen):
+                    seen.add(i_text)
+                    if key in self.key(text):
+                        yield text
+            if len(key) >= 3:
+                break  # every substring match is in the shortest posting list
+
+    def _fuzzy(self,
+               key: str,
+               limit: int,
+               exclude: Dict_T[str, int],
+               ) -> List_T[str]:
+        grams = set(trigrams(f' {key} '))
+        if not grams:
+            return []
+        shared = defaultdict(int)
+        for gram in grams:
+            for i_text in self._postings.get(gram, ()):
+                shared[i_text] += 1
+        threshold = self.minSimilarity * len(grams)
+        texts = self._texts
+        scored = ((count, texts[i_text])
+                  for i_text, count in shared.items()
+                  if count >= threshold
+                  and texts[i_text] is not None
+                  and texts[i_text] not in exclude)
+        return [text for _, text in nlargest(limit, scored, key=lambda pair: pair[0])]
+
+    def _index(self, texts: Iterable_T[str]) -> None:
+        ids = self._ids
+        all_texts = self._texts
+        postings = self._postings
+        key = self.key
+        i_text = len(all_texts)
+        for text in texts:
+            if text in ids:
+                continue
+            ids[text] = i_text
+            all_texts.append(text)
+            padded = f' {key(text)} '
+            for gram in {padded[i_char:i_char + 3] for i_char in range(len(padded) - 2)}:
+                try:
+                    postings[gram].append(i_text)
+                except KeyError:
+                    postings[gram] = array('L', (i_text,))
+            i_text += 1
+
+    def _reindex(self) -> None:
+        texts = list(self._ids)
+        self._postings.clear()
+        self._ids.clear()
+        self._texts.clear()
+        self._index(texts)
+
+
+# --- Frecency ---
+
+class Frecency:
+    """Selection counts and times, scored with exponential time decay.
+
+    Each selection adds 1 to its text's score, and scores halve every
+    `half_life` seconds. Weights are held relative to a fixed epoch (as
+    score * 2 ** ((now - epoch) / half_life)), so decay never needs applying:
+    a selection costs O(1), and ranking k texts costs O(k log k).
+    """
+    max_exponent = 512  # rebase weights before they overflow
+
+    def __init__(self,
+                 half_life: float = 3 * 24 * 3600.,
+                 clock: Callable_T[[], float] = time,
+                 ) -> None:
+        self.halfLife = half_life
+        self.clock = clock
+        self.counts: Dict_T[str, int] = dict()
+        self.times: Dict_T[str, float] = dict()  # last selection
+        self._weights: Dict_T[str, float] = dict()
+        self._epoch = clock()
+
+    def __len__(self) -> int:
+        return len(self._weights)
+
+    def __contains__(self, text: str) -> bool:
+        return text in self._weights
+
+    def select(self, text: str) -> None:
+        now = self.clock()
+        exponent = (now - self._epoch) / self.halfLife
+        if exponent > self.max_exponent:
+            self._rebase(now)
+            exponent = 0.
+        self._weights[text] = self._weights.get(text, 0.) + 2. ** exponent
+        self.counts[text] = self.counts.get(text, 0) + 1
+        self.times[text] = now
+
+    def weight(self, text: str) -> float:
+        """Relative score of text: comparable between texts, not over time."""
+        return self._weights.get(text, 0.)
+
+    def score(self, text: str) -> float:
+        """Decayed score of text now."""
+        return self.weight(text) * 2. ** ((self._epoch - self.clock()) / self.halfLife)
+
+    def rank(self, texts: Iterable_T[str]) -> List_T[str]:
+        """texts by descending score, otherwise in the order given."""
+        weights = self._weights
+        return sorted(texts, key=lambda text: -weights.get(text, 0.))
+
+    def clear(self) -> None:
+        self.counts.clear()
+        self.times.clear()
+        self._weights.clear()
+        self._epoch = self.clock()
+
+    def _rebase(self, now: float) -> None:
+        factor = 2. ** ((self._epoch - now) / self.halfLife)
+        self._weights = {text: weight * factor for text, weight in self._weights.items()}
+        self._epoch = now
@@ -8,20 +8,45 @@ TODO:
 """
 
 # stdlib
-from copy import deepcopy
-from collections import (namedtuple, Counter,
-                         deque as deck,)
+from time import perf_counter
+from threading import Lock
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+from functools import partial
+from operator import itemgetter
+from contextlib import contextmanager
+from collections import namedtuple, Counter
+from collections.abc import Sequence, MutableSequence, Mapping, Awaitable
 # pypi
-from qtpy.QtSvg import QSvgRenderer
-from qtpy.QtGui import QIcon, QPainter, QPixmap
-from qtpy.QtWidgets import QComboBox, QCompleter, QLabel
-from qtpy.QtCore import QStringListModel, QObject
+from qtpy.QtGui import QIcon, QPainter, QPixmap, QFont, QKeyEvent
+from qtpy.QtWidgets import (QComboBox, QCompleter, QLabel, QListView, QStyle,
+                            QStyledItemDelegate, QStyleOptionViewItem, QApplication,)
+from qtpy.QtCore import (Qt, Signal, QAbstractListModel, QStringListModel, QModelIndex,
+                         QObject, QRectF, QRunnable, QThreadPool, QTimer, QSize, QPoint,)
 # local
 from pycuties.icons import clock
+from pycuties.completion import CompletionEngine, Frecency
+from pycuties.storage import ItemStore, CompactIndex, ItemChain, History, ItemGroups
+from pycuties.timing import Timings, timed
+from pycuties.aio import (schedule, is_async_source, get_async_pager,
+                          AsyncCompletion, as_engine,)
 # type hints
 from typing import (Union as T_Union,
+                    Optional as Optional_T,
+                    Callable as Callable_T,
+                    Iterable as Iterable_T,
+                    Tuple as Tuple_T,
+                    Sequence as Sequence_T,
                     List as List_T,
-                    Deque as Deck_T)
+                    Dict as Dict_T,
+                    Set as Set_T,
+                    Iterator as Iterator_T,
+                    ContextManager as ContextManager_T,
+                    Hashable as Hashable_T,
+                    Mapping as Mapping_T,
+                    TYPE_CHECKING)
+if TYPE_CHECKING:
+    from pycuties.persist import HistoryStore  # (sqlite3 is only loaded by a store's owner)
 
 
 # --- Utility ---
@@ -29,39 +54,1499 @@ from typing import (Union as T_Union,
 Previous = namedtuple('Item', ('index', 'text'))
 
 
-def find_indices_to_remove(source: List_T,
-                           rm: List_T,
-                           ) -> List_T[int]:
-    n_match = -1
-    indices = list()
-    for i_source, item in enumerate(source):
-        if item in rm:
-            n_match += 1
-            indices.append(i_source - n_match)
-    return indices
-
-
-def get_indices_to_remove(source: List_T[str],
-                          idx_or_str: T_Union[int, str],
-                          ) -> List_T[int]:
-    if isinstance(idx_or_str, int):
-        if idx_or_str < len(source):  # index within range
-            indices = (idx_or_str,)
+def get_positions_to_remove(source: List_T[str],
+                            selection: T_Union[Iterable_T[T_Union[int, str]],
+                                               Callable_T[[str], bool]],
+                            index: 'ItemIndex' = None,
+                            ) -> List_T[int]:
+    """Sorted, distinct positions in source selected by indices and/or texts, or a predicate."""
+    if callable(selection):
+        return [i_item
+                for i_item, item in enumerate(source)
+                if selection(item)]
+
+    n_source = len(source)
+    positions = set()
+    for idx_or_str in selection:
+        if isinstance(idx_or_str, int):
+            if 0 <= idx_or_str < n_source:  # index within range
+                positions.add(idx_or_str)
+        elif isinstance(idx_or_str, str):
+            if index is None:
+                positions.update(i_item
+                                 for i_item, item in enumerate(source)
+                                 if item == idx_or_str)
+            else:
+                positions.update(index.positions(idx_or_str))
+        else:
+            raise TypeError
+    return sorted(positions)
+
+
+def get_runs(positions: Sequence_T[int]) -> List_T[Tuple_T[int, int]]:
+    """Group sorted, distinct positions into contiguous (start, count) runs."""
+    runs = list()
+    for position in positions:
+        if len(runs) and runs[-1][0] + runs[-1][1] == position:
+            runs[-1][1] += 1
         else:
-            indices = ()
-            
-    elif isinstance(idx_or_str, str):
-        indices = find_indices_to_remove(source, (idx_or_str,))
+            runs.append([position, 1])
+    return [(start, count) for start, count in runs]
+
+
+MAX_RUNS_IN_PLACE = 8  # (more runs are deleted by one copy of the survivors)
+
+
+def compact(items: List_T, runs: Sequence_T[Tuple_T[int, int]]) -> None:
+    """Delete runs from items: in place (last first) if few, else in one pass."""
+    if len(runs) <= MAX_RUNS_IN_PLACE:
+        for start, count in reversed(runs):
+            del items[start:start + count]
+        return
+    if isinstance(items, ItemStore):
+        items.deleteRuns(runs)
+        return
+    kept = list()
+    end = 0
+    for start, count in runs:
+        kept.extend(items[end:start])
+        end = start + count
+    kept.extend(items[end:])
+    items[:] = kept
+
+
+def get_pager(source: T_Union[Callable_T[[int, int], Iterable_T[str]],
+                              Iterable_T[str]],
+              ) -> Callable_T[[int], List_T[str]]:
+    """Normalise an extras provider to a callable returning its next page.
+
+    source is either a callable (offset, limit) -> items, or an iterable
+    (e.g. a generator) of items. A page shorter than its limit is the last.
+    """
+    if callable(source):
+        offset = 0
+
+        def fetch(limit: int) -> List_T[str]:
+            nonlocal offset
+            page = list(source(offset, limit))
+            offset += len(page)
+            return page
 
     else:
-        raise TypeError
+        iterator = iter(source)
+
+        def fetch(limit: int) -> List_T[str]:
+            return list(islice(iterator, limit))
+
+    return fetch
+
+
+def has_repeats(items: Sequence_T[str], index: T_Union['ItemIndex', CompactIndex]) -> bool:
+    """Whether any text occurs more than once in items, found from its index."""
+    return len(index) < len(items)  # distinct texts
+
+
+class ItemIndex:
+    """Hash index from item text to its position(s) within a list.
+
+    Kept in step with the list by `inserted` (after insertion) and
+    `removing` (before removal). Texts map to stable slots: removal leaves
+    tombstones, counted by a Fenwick tree (allocated on the first removal,
+    so indexing alone holds no per-item list), and a slot's position is the
+    slot less the tombstones before it. Appending and removing cost
+    O(log n) per text, wherever removed; inserting elsewhere shifts the
+    slots after it. Tombstones are purged once they outnumber items.
+    Single slots are stored as int, repeats as a sorted list.
+    """
+    def __init__(self, items: Sequence_T[str] = ()) -> None:
+        self._slots = dict()
+        self._tree: Optional_T[List_T[int]] = None  # Fenwick tree of tombstones, by slot + 1
+        self._n_slots = 0
+        self._n_removed = 0
+        self.inserted(items, 0, len(items))
+
+    def __contains__(self, text: str) -> bool:
+        return text in self._slots
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def first(self, text: str) -> int:
+        """Position of the first occurrence of text, or -1."""
+        entry = self._slots.get(text)
+        if entry is None:
+            return -1
+        return self._position(entry if isinstance(entry, int) else entry[0])
+
+    def positions(self, text: str) -> List_T[int]:
+        entry = self._slots.get(text, ())
+        return [self._position(entry)] if isinstance(entry, int) \
+          else [self._position(slot) for slot in entry]
+
+    def clear(self) -> None:
+        self._slots.clear()
+        self._tree = None
+        self._n_slots = 0
+        self._n_removed = 0
+
+    def inserted(self,
+                 items: Sequence_T[str],
+                 position: int,
+                 count: int,
+                 ) -> None:
+        """Register items[position:position + count], which were just inserted."""
+        end = position + count
+        if end < len(items):  # not appended: slots after shift
+            if self._n_removed:
+                self._rebuild(items)
+                return
+            self._shift(items, end, position)  # (slots are positions)
+            first_slot = position
+        else:
+            first_slot = self._n_slots
+        self._addSlots(count)
+        slots = self._slots
+        for slot, text in zip(range(first_slot, first_slot + count), items[position:end]):
+            entry = slots.get(text)
+            if entry is None:
+                slots[text] = slot
+            elif isinstance(entry, int):
+                slots[text] = sorted((entry, slot))
+            else:
+                insort(entry, slot)
+
+    def removing(self,
+                 items: Sequence_T[str],
+                 positions: Sequence_T[int],
+                 ) -> None:
+        """Unregister the items at sorted, distinct positions, which are about to be removed."""
+        n_positions = len(positions)
+        if not n_positions:
+            return
+        if n_positions >= len(items):
+            self.clear()
+            return
+        slots = self._slots
+        for position in reversed(positions):  # (tombstones only move positions after them)
+            text = items[position]
+            entry = slots[text]
+            if isinstance(entry, int):
+                slot = entry
+                del slots[text]
+            else:
+                slot = entry.pop(self._find(entry, position))
+                if len(entry) == 1:
+                    slots[text] = entry[0]
+            self._bury(slot)
+        if self._n_removed > len(items) - n_positions:  # (more tombstones than items)
+            removed = positions if isinstance(positions, range) else set(positions)
+            self._rebuild([item for i_item, item in enumerate(items) if i_item not in removed])
+
+    # --- Slots ---
+
+    def _position(self, slot: int) -> int:
+        """Slot less the tombstones before it."""
+        if not self._n_removed:
+            return slot
+        tree = self._tree
+        n_before = 0
+        i_node = slot
+        while i_node:
+            n_before += tree[i_node]
+            i_node &= i_node - 1
+        return slot - n_before
+
+    def _find(self, entry: List_T[int], position: int) -> int:
+        """Index within entry (sorted slots) of the slot at position."""
+        low, high = 0, len(entry) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self._position(entry[middle]) < position:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _bury(self, slot: int) -> None:
+        tree = self._tree
+        if tree is None:
+            tree = self._tree = [0] * (self._n_slots + 1)
+        i_node = slot + 1
+        while i_node < len(tree):
+            tree[i_node] += 1
+            i_node += i_node & -i_node
+        self._n_removed += 1
+
+    def _addSlots(self, count: int) -> None:
+        tree = self._tree
+        self._n_slots += count
+        if tree is None:  # (no tombstones yet)
+            return
+        for _ in range(count):  # (each node sums the tombstones it covers)
+            i_node = len(tree)
+            tree.append(self._nBuried(i_node - 1) - self._nBuried(i_node - (i_node & -i_node)))
+
+    def _nBuried(self, n_slots: int) -> int:
+        """Tombstones among the first n_slots."""
+        tree = self._tree
+        total = 0
+        while n_slots:
+            total += tree[n_slots]
+            n_slots &= n_slots - 1
+        return total
+
+    def _rebuild(self, items: Sequence_T[str]) -> None:
+        """Index items afresh, one slot per position (no tombstones)."""
+        self.clear()
+        self.inserted(items, 0, len(items))
+
+    def _shift(self,
+               items: Sequence_T[str],
+               start: int,
+               at: int,
+               ) -> None:
+        """Shift slots >= at by (start - at), for the items from start onward."""
+        slots = self._slots
+        delta = start - at
+        repeated = set()
+        for i_item in range(start, len(items)):
+            text = items[i_item]
+            entry = slots[text]
+            if isinstance(entry, int):
+                slots[text] = entry + delta
+            else:
+                repeated.add(text)
+        for text in repeated:
+            slots[text] = [slot + delta if slot >= at else slot
+                           for slot in slots[text]]
+
+
+# --- Icons ---
+
+icon_cache: Dict_T[Tuple_T[str, int, float], QIcon] = dict()
+
+
+def get_icon(svg: str, size: int = 10, ratio: float = 1.0) -> QIcon:
+    """Icon of svg, rendered once per process for each size and device pixel ratio.
+
+    The pixmap has size * ratio physical pixels, so it is sharp on HiDPI screens.
+    """
+    key = (svg, size, ratio)
+    icon = icon_cache.get(key)
+    if icon is None:
+        from qtpy.QtSvg import QSvgRenderer  # (deferred: only loaded to render)
+        renderer = QSvgRenderer(bytearray(svg, 'utf-8'))
+        pix = QPixmap(round(size * ratio), round(size * ratio))
+        pix.setDevicePixelRatio(ratio)
+        paint = QPainter(pix)
+        renderer.render(paint, QRectF(0, 0, size, size))
+        paint.end()
+        icon = icon_cache[key] = QIcon(pix)
+    return icon
+
+
+# --- Model ---
+
+DEFAULTS = 'defaults'
+EXPANDER = 'expander'
+HISTORY = 'history'
+EXTRAS = 'extras'
+GROUP = 'group'  # header of a group of extras
+MORE = 'more'  # reveals the next page of extras
+
+
+class ExpandoModel(QAbstractListModel):
+    """Presents defaults, expander and history|extras as contiguous row ranges.
+
+    Rows:
+        *defaults, expander, *history    (collapsed)
+        *defaults, expander, *extras     (expanded)
+        *defaults                        (no extras)
+        *extras                          (no defaults)
+
+    Defaults and extras are held by an ItemCatalog (possibly shared with
+    other boxes), which announces every change to each attached model as a
+    single row range. The model holds its own history and expansion, and
+    expansion is a swap of the trailing range (one removal, one insertion)
+    regardless of length.
+
+    Whilst extras are displayed, further pages from the catalog's extras
+    provider are fetched through Qt's canFetchMore|fetchMore.
+
+    Grouped extras are displayed as a header row per group, each followed by
+    its extras only whilst that group is open (rows of closed groups are
+    never created):
+        *defaults, expander, (header, [*group extras])...    (expanded)
+    Changes to grouped extras whilst displayed reset the model.
+
+    Given a page size, extras are revealed a page at a time, followed by a
+    row to reveal the next page, whilst there are more:
+        *defaults, expander, *extras[:n_shown], more    (expanded)
+    so expansion costs O(page) rather than O(extras). Extras keep the rows
+    they would have if all were displayed, and changes to them whilst
+    displayed reset the model.
+    """
+    def __init__(self,
+                 catalog: 'ItemCatalog',
+                 history: History,
+                 expander: str,
+                 icon: T_Union[QIcon, Callable_T[[float], QIcon], None] = None,
+                 parent: QObject = None,
+                 page: int = None,
+                 more: str = 'more…',
+                 ) -> None:
+        super().__init__(parent)
+        self.catalog = catalog
+        self.history = history
+        self.expander = expander
+        self.page = page  # (None: all extras at once)
+        self.more = more
+        self.icon = icon  # (or a factory of device pixel ratio, called on first display of history)
+        self.expanded = False
+        # text -> position(s), for defaults|extras
+        self.indices = catalog.indices
+        # userData, allocated on first use (parallel to defaults|extras)
+        self._user_data = catalog.user_data
+        # displayed layout: *defaults, [expander], *tail
+        self._has_expander = False
+        self._tail = None
+        self._stale = False  # (changed whilst the catalog batched changes: reset after)
+        # grouped extras: open groups, and first row of each group (within the tail)
+        self._open: Set_T[int] = set()
+        self._group_rows: Optional_T[List_T[int]] = None
+        self._group_rows_version = -1
+        self._header_font = None
+        # paged extras: extras to show, and (shown, has more row) as displayed
+        self._n_revealed = page or 0
+        self._paged_rows = (0, False)
+        self._settle()
+        catalog.attach(self)
+
+    @property
+    def defaults(self) -> Sequence_T[str]:
+        return self.catalog.defaults
+
+    @property
+    def extras(self) -> Sequence_T[str]:
+        return self.catalog.extras
+
+    @property
+    def groups(self) -> Optional_T[ItemGroups]:
+        return self.catalog.groups
+
+    # --- Qt Interface ---
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.defaults) + self._has_expander + self._tailLength()
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> object:
+        if not index.isValid():
+            return None
+        segment, i_item = self.locate(index.row())
+        if segment is None:
+            return None
+        if segment == GROUP:
+            return self._headerData(i_item, role)
+        if segment == MORE:
+            return self.more if role in (Qt.DisplayRole, Qt.EditRole) else None
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return self.expander if segment == EXPANDER \
+              else self._items(segment)[i_item]
+        if role == Qt.DecorationRole:
+            if segment != HISTORY:
+                return None
+            if callable(self.icon):
+                self.icon = self.icon(QApplication.instance().devicePixelRatio())
+            return self.icon
+        if role == Qt.UserRole:
+            data = self._user_data.get(segment)
+            return None if data is None else data[i_item]
+        return None
+
+    def setData(self, index: QModelIndex, value: object, role: int = Qt.EditRole) -> bool:
+        if role != Qt.UserRole or not index.isValid():
+            return False
+        segment, i_item = self.locate(index.row())
+        if segment not in (DEFAULTS, EXTRAS):
+            return False
+        self.catalog.setUserData(segment, i_item, value)
+        return True
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        return (not parent.isValid()
+                and self.catalog.canFetchMore()
+                and self._tail == EXTRAS
+                and self.page is None)  # (paged: fetched by showMore)
+
+    def fetchMore(self, parent: QModelIndex) -> None:
+        if not parent.isValid():
+            self.catalog.fetchExtras()
+
+    # --- Layout ---
+
+    def locate(self, row: int):
+        """Map a row to its (segment, index within segment)."""
+        n_defaults = len(self.defaults)
+        if row < n_defaults:
+            return DEFAULTS, row
+        row -= n_defaults
+        if self._has_expander:
+            if row == 0:
+                return EXPANDER, 0
+            row -= 1
+        if self._isGrouped():
+            if not 0 <= row < self._tailLength():
+                return None, -1
+            group_rows = self._groupRows()
+            i_group = bisect_right(group_rows, row) - 1
+            row -= group_rows[i_group]
+            if not row:
+                return GROUP, i_group
+            return EXTRAS, self.groups.starts()[i_group] + row - 1
+        if self._isPaged():
+            n_shown, has_more = self._paged_rows
+            if row < n_shown:
+                return EXTRAS, row
+            return (MORE, 0) if row == n_shown and has_more else (None, -1)
+        if row < len(self._tailItems()):
+            return self._tail, row
+        return None, -1
+
+    def offset(self, segment: str) -> Optional_T[int]:
+        """First row of a segment, or None if it is not displayed.
+
+        Whilst the catalog batches changes, rows are not announced (None), and
+        the model is reset once the batch ends.
+        """
+        if self.catalog.batching():
+            self._stale = True
+            return None
+        if segment == EXTRAS and (self._isGrouped() or self._isPaged()):
+            self._stale = True  # (not contiguous, or partly shown: reset after the change)
+            return None
+        if segment == DEFAULTS:
+            return 0
+        if segment == EXPANDER:
+            return len(self.defaults) if self._has_expander else None
+        if segment == self._tail:
+            return len(self.defaults) + self._has_expander
+        return None
+
+    def find(self, segment: str, text: str) -> int:
+        """Position of the first occurrence of text in defaults|extras, or -1."""
+        return self.indices[segment].first(text)
+
+    def setExpanded(self, expanded: bool) -> None:
+        self.expanded = expanded
+        if expanded:
+            self._n_revealed = self.page or 0  # (first page)
+            if self.page is not None:
+                self._fetchRevealed()
+        self._settle()
+        if self._tail != EXTRAS:
+            self._open.clear()  # (groups are closed when next expanded)
+            self._group_rows = None
+            self._n_revealed = self.page or 0
+
+    # --- Pages ---
+
+    def showMore(self) -> None:
+        """Reveal the next page of extras, fetched from the catalog's provider if needed."""
+        if (not self._isPaged()
+        or not self._paged_rows[1]):
+            return
+        self._n_revealed = self._paged_rows[0] + self.page
+        self._fetchRevealed()  # (announced by a reset)
+        n_old, had_more = self._paged_rows
+        n_new, has_more = self._pageRows()
+        first = len(self.defaults) + self._has_expander
+        if n_new > n_old:
+            self.beginInsertRows(QModelIndex(), first + n_old, first + n_new - 1)
+            self._paged_rows = (n_new, had_more)
+            self.endInsertRows()
+        if had_more and not has_more:
+            self.beginRemoveRows(QModelIndex(), first + n_new, first + n_new)
+            self._paged_rows = (n_new, False)
+            self.endRemoveRows()
+        self._paged_rows = (n_new, has_more)
+
+    def _fetchRevealed(self) -> None:
+        """Fetch extras to be revealed but not yet fetched, from the catalog's provider."""
+        n_missing = self._n_revealed - len(self.extras)
+        if n_missing > 0 and self.catalog.canFetchMore():
+            self.catalog.fetchExtras(n_missing)
+
+    def _isPaged(self) -> bool:
+        return self._tail == EXTRAS and self.page is not None and self.groups is None
+
+    def _pageRows(self) -> Tuple_T[int, bool]:
+        """(extras shown, whether more can be) for the extras as they are."""
+        n_extras = len(self.extras)
+        n_shown = min(self._n_revealed, n_extras)
+        return n_shown, n_shown < n_extras or self.catalog.canFetchMore()
+
+    # --- Groups ---
+
+    def isGroupOpen(self, i_group: int) -> bool:
+        return i_group in self._open
+
+    def setGroupOpen(self, i_group: int, open_: bool) -> None:
+        """Create (or drop) the rows of a group's extras, after its header."""
+        if open_ == (i_group in self._open):
+            return
+        start, stop = self.groups.span(i_group)
+        if not self._isGrouped() or start == stop:
+            self._setOpen(i_group, open_)
+            return
+        first = len(self.defaults) + self._has_expander + self._groupRows()[i_group] + 1
+        if open_:
+            self.beginInsertRows(QModelIndex(), first, first + stop - start - 1)
+            self._setOpen(i_group, open_)
+            self.endInsertRows()
+        else:
+            self.beginRemoveRows(QModelIndex(), first, first + stop - start - 1)
+            self._setOpen(i_group, open_)
+            self.endRemoveRows()
+
+    def _setOpen(self, i_group: int, open_: bool) -> None:
+        if open_:
+            self._open.add(i_group)
+        else:
+            self._open.discard(i_group)
+        self._group_rows = None
+
+    def _isGrouped(self) -> bool:
+        return self._tail == EXTRAS and self.groups is not None
+
+    def _groupRows(self) -> List_T[int]:
+        """Row of each group's header, from the first (a sentinel row after the last)."""
+        groups = self.groups
+        if (self._group_rows is None
+        or self._group_rows_version != groups.version):
+            rows = [0]
+            for i_group, size in enumerate(groups.sizes):
+                rows.append(rows[-1] + 1 + (size if i_group in self._open else 0))
+            self._group_rows = rows
+            self._group_rows_version = groups.version
+        return self._group_rows
+
+    def _headerData(self, i_group: int, role: int) -> object:
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return self.groups.names[i_group]
+        if role == Qt.FontRole:
+            if self._header_font is None:
+                self._header_font = QFont()
+                self._header_font.setBold(True)
+            return self._header_font
+        return None
+
+    def _items(self, segment: str) -> Sequence_T[str]:
+        return {DEFAULTS: self.defaults,
+                EXTRAS: self.extras,
+                HISTORY: self.history}[segment]
+
+    def _tailItems(self) -> Sequence_T[str]:
+        return () if self._tail is None else self._items(self._tail)
+
+    def _tailLength(self) -> int:
+        """Rows after defaults and expander."""
+        if self._isGrouped():
+            return self._groupRows()[-1]
+        if self._isPaged():
+            return sum(self._paged_rows)
+        return len(self._tailItems())
+
+    def _layout(self) -> Tuple_T[Optional_T[str], bool]:
+        """(tail, has_expander) for the item lists as they are."""
+        n_defaults = len(self.defaults)
+        n_extras = len(self.extras)
+        if not n_extras:
+            tail = None
+        elif not n_defaults or self.expanded:
+            tail = EXTRAS
+        else:
+            tail = HISTORY
+        return tail, bool(n_defaults and n_extras)
+
+    def _settle(self) -> None:
+        """Bring the displayed layout in line with the item lists."""
+        if self.catalog.batching():
+            self._stale = True
+            return
+        if self._stale:  # (rows changed unannounced)
+            self.reset()
+            return
+        tail, has_expander = self._layout()
+        if tail != self._tail:
+            self._setTail(tail)
+        if has_expander != self._has_expander:
+            n_defaults = len(self.defaults)
+            if has_expander:
+                self.beginInsertRows(QModelIndex(), n_defaults, n_defaults)
+                self._has_expander = True
+                self.endInsertRows()
+            else:
+                self.beginRemoveRows(QModelIndex(), n_defaults, n_defaults)
+                self._has_expander = False
+                self.endRemoveRows()
+
+    def reset(self) -> None:
+        """Re-read all rows, e.g. after a batch of changes."""
+        self.beginResetModel()
+        self._tail, self._has_expander = self._layout()
+        self._paged_rows = self._pageRows()
+        self._stale = False
+        self.endResetModel()
+
+    def _setTail(self, tail: Optional_T[str]) -> None:
+        first = len(self.defaults) + self._has_expander
+        n_old = self._tailLength()
+        if n_old:
+            self.beginRemoveRows(QModelIndex(), first, first + n_old - 1)
+            self._tail = None
+            self.endRemoveRows()
+        self._tail = tail
+        self._paged_rows = self._pageRows()
+        n_new = self._tailLength()
+        self._tail = None
+        if n_new:
+            self.beginInsertRows(QModelIndex(), first, first + n_new - 1)
+            self._tail = tail
+            self.endInsertRows()
+        self._tail = tail
+
+    # --- History Modification(s) ---
+
+    def pushHistory(self, text: str, key: Hashable_T = None) -> None:
+        """appendleft to history, evicting its oldest entry if full.
+
+        A present key is moved to the front (or its ranked row), as one row move.
+        """
+        history = self.history
+        if history.maxlen == 0:
+            return
+        key = text if key is None else key
+        first = self.offset(HISTORY)
+        if key in history:
+            row = history.row(key)
+            new_row = history.rowFor(key, text)
+            moved = new_row != row and first is not None
+            if moved:
+                self.beginMoveRows(QModelIndex(), first + row, first + row,
+                                   QModelIndex(), first + new_row + (new_row > row))
+            history.appendleft(text, key)
+            if moved:
+                self.endMoveRows()
+            return
+        if history.isFull():
+            self.removeHistory((history.oldest(),))
+        self._insertHistory(key, text, recent=True)
+
+    def extendHistory(self, entries: Iterable_T[Tuple_T[Hashable_T, str]]) -> None:
+        """Append (key, text) entries, most recent first, as older than present history."""
+        history = self.history
+        for key, text in entries:
+            if history.isFull():
+                break
+            if key not in history:
+                self._insertHistory(key, text, recent=False)
+
+    def _insertHistory(self, key: Hashable_T, text: str, recent: bool) -> None:
+        history = self.history
+        first = self.offset(HISTORY)
+        if first is not None:
+            row = first + history.rowFor(key, text, recent)
+            self.beginInsertRows(QModelIndex(), row, row)
+        if recent:
+            history.appendleft(text, key)
+        else:
+            history.append(text, key)
+        if first is not None:
+            self.endInsertRows()
+
+    def rerankHistory(self) -> None:
+        """Re-order history rows after a change of rank (e.g. a selection)."""
+        history = self.history
+        first = self.offset(HISTORY)
+        if (first is None
+        or not len(history)):
+            history.rerank()
+            return
+        keys = history.keys()
+        self.layoutAboutToBeChanged.emit()
+        history.rerank()
+        for index in self.persistentIndexList():
+            row = index.row() - first
+            if 0 <= row < len(keys):
+                self.changePersistentIndex(index, self.index(first + history.row(keys[row])))
+        self.layoutChanged.emit()
+
+    def removeHistory(self, keys: Iterable_T[Hashable_T]) -> None:
+        """Remove the history entries under keys, by contiguous rows."""
+        history = self.history
+        rows_keys = sorted(((history.row(key), key) for key in keys),
+                           key=itemgetter(0))  # (keys kept: history.keys() would be rebuilt)
+        rows = [row for row, _ in rows_keys]
+        first = self.offset(HISTORY)
+        i_end = len(rows_keys)
+        for start, count in reversed(get_runs(rows)):
+            run = [key for _, key in rows_keys[i_end - count:i_end]]
+            i_end -= count
+            if first is not None:
+                self.beginRemoveRows(QModelIndex(), first + start, first + start + count - 1)
+            for key in run:
+                history.remove(key)
+            if first is not None:
+                self.endRemoveRows()
+
+    def clearHistory(self) -> None:
+        first = self.offset(HISTORY)
+        n_history = len(self.history)
+        if first is not None and n_history:
+            self.beginRemoveRows(QModelIndex(), first, first + n_history - 1)
+        self.history.clear()
+        if first is not None and n_history:
+            self.endRemoveRows()
+
+
+class CompletionModel(QAbstractListModel):
+    """Read-only list model over a completion engine's top results.
+
+    Results are few (n_completions), so they are held as a Python list and
+    replaced whole, rather than copied into Qt as by QStringListModel.
+    """
+    def __init__(self,
+                 items: List_T[str],
+                 parent: QObject = None,
+                 ) -> None:
+        super().__init__(parent)
+        self.items = items
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> object:
+        if (index.isValid()
+        and role in (Qt.DisplayRole, Qt.EditRole)):
+            return self.items[index.row()]
+        return None
+
+    def replaceItems(self, texts: Sequence_T[str]) -> None:
+        self.beginResetModel()
+        self.items[:] = texts
+        self.endResetModel()
+
+
+class AllItemsModel(QStringListModel):
+    """The completer's copy of all items, updated by row range.
+
+    Texts are held in Qt, so QCompleter filters without calling into Python
+    (data() is not reimplemented); changes are announced as row insertions|
+    removals, or as one layout change for scattered runs, so QCompleter
+    re-filters once per change rather than once per row or run.
+    """
+    def insertTexts(self, position: int, texts: Sequence_T[str]) -> None:
+        n_texts = len(texts)
+        if not n_texts:
+            return
+        last = position + n_texts - 1
+        self.insertRows(position, n_texts)
+        # (rows are filled silently, and announced as one data change)
+        self.blockSignals(True)
+        try:
+            for row, text in enumerate(texts, position):
+                self.setData(self.index(row), text)
+        finally:
+            self.blockSignals(False)
+        self.dataChanged.emit(self.index(position), self.index(last))
+
+    def removePositions(self, positions: Sequence_T[int]) -> None:
+        """Remove texts at sorted, distinct positions, as a single update."""
+        runs = get_runs(positions)
+        if not len(runs):
+            return
+        if len(runs) == 1:
+            start, count = runs[0]
+            self.removeRows(start, count)
+            return
+        # (rows are removed silently, and announced as one layout change)
+        self.layoutAboutToBeChanged.emit()
+        self.blockSignals(True)
+        try:
+            if len(runs) <= MAX_RUNS_IN_PLACE:
+                for start, count in reversed(runs):
+                    self.removeRows(start, count)
+            else:
+                texts = self.stringList()
+                compact(texts, runs)
+                self.setStringList(texts)
+        finally:
+            self.blockSignals(False)
+        self.layoutChanged.emit()
+
+
+class CompletionQuery(QRunnable):
+    """Completion engine query, run on a QThreadPool worker.
+
+    Results are emitted through `box._completionsReady`, which is delivered
+    to the GUI thread as a queued signal. A query superseded before it starts
+    is skipped; one superseded whilst running is discarded on delivery.
+    """
+    def __init__(self,
+                 box: 'ExpandoBox',
+                 serial: int,
+                 text: str,
+                 ) -> None:
+        super().__init__()
+        self.box = box
+        self.serial = serial
+        self.text = text
+
+    def run(self) -> None:
+        box = self.box
+        if self.serial != box._query_serial:  # superseded
+            return
+        results = box._catalog.query(self.text, box._n_completions)
+        try:
+            box._completionsReady.emit(self.serial, results)
+        except RuntimeError:  # box deleted
+            pass
+
+
+# --- Catalog ---
+
+class CatalogBatch:
+    """Net effect of the changes made within ItemCatalog.batchUpdate.
+
+    Adds append, so whilst no item held before the batch is removed (and
+    nothing is inserted before them), each segment is its original items
+    followed by those added: if none of those remain either, the batch
+    changed nothing.
+    """
+    def __init__(self, catalog: 'ItemCatalog') -> None:
+        self.announced = False  # itemsAboutToChange emitted
+        self.changed = False  # an original item removed, or an item inserted among them
+        # segment -> number of original items, at the start of the segment
+        self.originals = {DEFAULTS: len(catalog.defaults),
+                          EXTRAS: len(catalog.extras)}
+        # for the completion engine (net) and extrasRemoved
+        self.added: List_T[str] = list()
+        self.removed: List_T[str] = list()
+        self.removedExtras: Set_T[str] = set()
+
+    def inserted(self, segment: str, position: int, texts: List_T[str]) -> None:
+        if position < self.originals[segment]:
+            self.changed = True
+            self.originals[segment] += len(texts)
+        self.added.extend(texts)
+
+    def removing(self, segment: str, positions: Sequence_T[int], texts: List_T[str]) -> None:
+        n_originals = bisect_left(positions, self.originals[segment])
+        if n_originals:
+            self.changed = True
+            self.originals[segment] -= n_originals
+        self.removed.extend(texts)
+        if segment == EXTRAS:
+            self.removedExtras.update(texts)
+
+    def isChanged(self, catalog: 'ItemCatalog') -> bool:
+        return (self.changed
+                or any(len(catalog._items(segment)) > n_originals
+                       for segment, n_originals in self.originals.items()))
+
+
+class ItemCatalog(QObject):
+    """Defaults and extras, shareable between ExpandoBoxes.
+
+    The item lists, their indices and userData, the completer's item model
+    and any completion engine are held once, however many boxes attach.
+    Each change is made once, and announced to every attached box's model as
+    row ranges; boxes keep their own history, selection and expansion.
+
+    extras may be a list, or a provider (see get_pager|get_async_pager) of
+    which pages of n_fetch_extras are fetched whilst extras are displayed.
+    Items are held as given, not copied: an immutable sequence (e.g. a
+    tuple) is copied to a list only when its segment is first changed.
+
+    With compact, texts are held once in ItemStores (one UTF-8 buffer each)
+    and indexed by CompactIndex, which holds positions only; models read the
+    stores through ItemChain. The completer (filtering in Qt) and a completion
+    engine still keep their own copies of the texts.
 
-    return indices
+    With unique, a text is held at most once across defaults and extras:
+    insertions are checked against the indices, in O(texts inserted).
+
+    extras may also be a mapping of group name -> texts (e.g. by vendor).
+    They are held, indexed and completed as one list, in group order, with
+    their groups' sizes in `groups`; boxes open groups one at a time.
+    """
+    itemsAboutToChange = Signal()
+    itemsChanged = Signal()
+    extrasRemoved = Signal(set)  # texts no longer among the extras
+    fetched = Signal(list)  # extras appended from the provider
+    _pageReady = Signal(object, int)
+    _queriesDone = Signal()  # (from the completion pool) engine updates queued
+
+    def __init__(self,
+                 defaults: List_T[str] = None,
+                 extras: T_Union[List_T[str], Mapping_T[str, Sequence_T[str]],
+                                 Callable_T, Iterable_T[str]] = None,
+                 completion: T_Union[CompletionEngine, Callable_T] = None,
+                 n_fetch_extras: int = 100,
+                 parent: QObject = None,
+                 compact: bool = False,
+                 unique: bool = False,
+                 ) -> None:
+        super().__init__(parent)
+        self.unique = unique
+        defaults = [] if defaults is None else defaults
+        extras = [] if extras is None else extras
+        self._fetch = None
+        self.groups: Optional_T[ItemGroups] = None
+        if isinstance(extras, Mapping):
+            # grouped: held as one list (copied to a list when first changed)
+            self.groups = ItemGroups(extras.keys(), map(len, extras.values()))
+            extras = tuple(text for texts in extras.values() for text in texts)
+        elif not isinstance(extras, Sequence):
+            # provider: extras are fetched in pages of n_fetch_extras
+            # (an async provider's as tasks on the event loop)
+            self._fetch = (get_async_pager(extras) if is_async_source(extras)
+                           else get_pager(extras))
+            extras = []
+        completion = as_engine(completion)
+        Index = ItemIndex
+        if compact:
+            defaults = ItemStore(defaults)
+            extras = ItemStore(extras)
+            Index = CompactIndex
+        self.defaults = defaults
+        self.extras = extras
+        # text -> position(s), for defaults|extras
+        self.indices = {DEFAULTS: Index(defaults),
+                        EXTRAS: Index(extras)}
+        # userData, allocated on first use (parallel to defaults|extras)
+        self.user_data = {DEFAULTS: None, EXTRAS: None}
+        self.models: List_T[ExpandoModel] = list()
+        # all items (a view, not a copy), and without an engine, the
+        # completer's copy (held in Qt, where QCompleter filters)
+        self.all_items = ItemChain(defaults, extras)
+        self.allItemsModel: Optional_T[AllItemsModel] = None
+        if completion is None:
+            self.allItemsModel = AllItemsModel(list(self.all_items), parent=self)
+        self.completion = completion
+        if completion is not None:
+            completion.add(self.all_items)
+        # engine, between GUI and completion pool: whilst queries are in flight,
+        # updates are queued (the GUI thread only waits on lock briefly)
+        self.lock = Lock()  # _n_querying and _engine_updates
+        self._queryLock = Lock()  # one query at a time
+        self._n_querying = 0
+        self._engine_updates: List_T[Tuple_T[Callable_T, List_T[str]]] = list()
+        self._queriesDone.connect(self._flushEngine, Qt.QueuedConnection)
+        # extras provider
+        self._fetching = None  # pending async page
+        self.nFetch = n_fetch_extras
+        self._pageReady.connect(self._addPage, Qt.QueuedConnection)
+        self._batch: Optional_T[CatalogBatch] = None
+        if unique:
+            self._verifyUnique()
+
+    def attach(self, model: ExpandoModel) -> None:
+        """Announce changes to model, until it is destroyed."""
+        self.models.append(model)
+        model.destroyed.connect(partial(self.detach, model))
+
+    def detach(self, model: ExpandoModel, *_) -> None:
+        if model in self.models:
+            self.models.remove(model)
+
+    def _items(self, segment: str) -> Sequence_T[str]:
+        return self.defaults if segment == DEFAULTS else self.extras
+
+    def _writable(self, segment: str) -> MutableSequence:
+        """A segment's items, first copied to a list if held immutable (copy-on-write)."""
+        items = self._items(segment)
+        if not isinstance(items, MutableSequence):
+            items = list(items)
+            if segment == DEFAULTS:
+                self.defaults = self.all_items.defaults = items
+            else:
+                self.extras = self.all_items.extras = items
+        return items
+
+    def _offset(self, segment: str) -> int:
+        """Position of a segment in all_items."""
+        return 0 if segment == DEFAULTS else len(self.defaults)
+
+    def _dataList(self, segment: str) -> List_T[object]:
+        data = self.user_data[segment]
+        if data is None:
+            data = self.user_data[segment] = [None] * len(self._items(segment))
+        return data
+
+    def _verifyTexts(self, texts: List_T[str]) -> None:
+        if not len(self.models):
+            return
+        texts_set = set(texts)
+        for model in self.models:
+            if model.expander in texts_set:
+                raise err_add_expander(model.parent(), texts)
+
+    def _distinct(self, texts: List_T[str]) -> Tuple_T[List_T[int], List_T[str]]:
+        """Positions within texts of those not yet held (first occurrences), and the repeats."""
+        indices = self.indices.values()
+        seen = set()
+        kept = list()
+        repeats = dict()  # ordered, distinct
+        for i_text, text in enumerate(texts):
+            if (text in seen
+            or any(text in index for index in indices)):
+                repeats[text] = None
+            else:
+                seen.add(text)
+                kept.append(i_text)
+        return kept, list(repeats)
+
+    def _verifyUnique(self) -> None:
+        """Raise ValueError if any text is held twice, found from the indices."""
+        defaults = self.defaults
+        extras = self.extras
+        indices = self.indices
+        shorter, other = (DEFAULTS, EXTRAS) if len(defaults) <= len(extras) \
+                    else (EXTRAS, DEFAULTS)
+        if (has_repeats(defaults, indices[DEFAULTS])
+        or has_repeats(extras, indices[EXTRAS])
+        or any(text in indices[other]
+               for text in self._items(shorter))):
+            raise ValueError('Items were required to be unique, but one or more repeat was given.')
+
+    # --- Item Modification(s) ---
+
+    def addDefaults(self,
+                    texts: Sequence_T[str],
+                    user_data: Sequence_T[object] = None,
+                    skip_repeats: bool = False,
+                    ) -> None:
+        self.insertItems(DEFAULTS, len(self.defaults), texts, user_data, skip_repeats)
+
+    def addExtras(self,
+                  texts: Sequence_T[str],
+                  user_data: Sequence_T[object] = None,
+                  skip_repeats: bool = False,
+                  group: str = None,
+                  ) -> None:
+        """Append texts to the extras, or to the end of a group of them (new if not held)."""
+        position = len(self.extras)
+        if group is not None:
+            if self.groups is None:
+                raise err_not_grouped(group)
+            i_group = self.groups.find(group)
+            if i_group >= 0:
+                position = self.groups.span(i_group)[1]
+        self.insertItems(EXTRAS, position, texts, user_data, skip_repeats, group)
+
+    def removeDefaults(self,
+                       indices_or_items: T_Union[Iterable_T[T_Union[int, str]],
+                                                 Callable_T[[str], bool]],
+                       ) -> None:
+        """Remove defaults by index and/or text, or those matching a predicate."""
+        self.removePositions(DEFAULTS, get_positions_to_remove(self.defaults, indices_or_items,
+                                                               self.indices[DEFAULTS]))
+
+    def removeExtras(self,
+                     indices_or_items: T_Union[Iterable_T[T_Union[int, str]],
+                                               Callable_T[[str], bool]],
+                     ) -> None:
+        """Remove extras by index and/or text, or those matching a predicate."""
+        self.removePositions(EXTRAS, get_positions_to_remove(self.extras, indices_or_items,
+                                                             self.indices[EXTRAS]))
+
+    def clearDefaults(self) -> None:
+        self.removeItems(DEFAULTS, 0, len(self.defaults))
+
+    def clearExtras(self) -> None:
+        self.stopFetching()
+        self.removeItems(EXTRAS, 0, len(self.extras))
+
+    def setUserData(self, segment: str, position: int, value: object) -> None:
+        self._dataList(segment)[position] = value
+        for model in self.models:
+            first = model.offset(segment)
+            if first is not None:
+                index = model.index(first + position, 0)
+                model.dataChanged.emit(index, index, [Qt.UserRole])
+
+    def insertItems(self,
+                    segment: str,
+                    position: int,
+                    texts: Sequence_T[str],
+                    user_data: Sequence_T[object] = None,
+                    skip_repeats: bool = False,
+                    group: str = None,
+                    ) -> None:
+        """Insert texts into defaults|extras, as one row range per model displaying them.
+
+        If unique, texts already held (or given twice) are skipped, or else
+        reported together in one ValueError before anything is inserted.
+        Grouped extras join the named group (added if new), or else the
+        group at position.
+        """
+        texts = list(texts)
+        if self.unique:
+            kept, repeats = self._distinct(texts)
+            if not skip_repeats and len(repeats):
+                raise err_repeats(repeats)
+            if len(kept) < len(texts):
+                texts = [texts[i_text] for i_text in kept]
+                if user_data is not None:
+                    user_data = [user_data[i_text] for i_text in kept]
+        n_texts = len(texts)
+        if not n_texts:
+            return
+        self._verifyTexts(texts)
+        items = self._writable(segment)
+        data = self.user_data[segment]
+        if data is None and user_data is not None and any(d is not None for d in user_data):
+            data = self._dataList(segment)
+        if self._batch is not None:
+            self._batchAboutToChange()
+            self._batch.inserted(segment, position, texts)
+            items[position:position] = texts
+            self.indices[segment].inserted(items, position, n_texts)
+            self._groupInserted(segment, position, n_texts, group)
+            if data is not None:
+                data[position:position] = [None] * n_texts if user_data is None else user_data
+            return
+        self.itemsAboutToChange.emit()
+        shown = [model for model in self.models
+                 if model.offset(segment) is not None]
+        for model in shown:
+            first = model.offset(segment) + position
+            model.beginInsertRows(QModelIndex(), first, first + n_texts - 1)
+        items[position:position] = texts
+        self.indices[segment].inserted(items, position, n_texts)
+        self._groupInserted(segment, position, n_texts, group)
+        if data is not None:
+            data[position:position] = [None] * n_texts if user_data is None else user_data
+        for model in shown:
+            model.endInsertRows()
+        for model in self.models:
+            model._settle()
+        if self.allItemsModel is not None:
+            self.allItemsModel.insertTexts(self._offset(segment) + position, texts)
+        # completion engine
+        if self.completion is not None:
+            self._updateEngine(self.completion.add, texts)
+        self.itemsChanged.emit()
+
+    def removeItems(self,
+                    segment: str,
+                    position: int,
+                    count: int = 1,
+                    ) -> None:
+        """Remove a contiguous run of defaults|extras."""
+        if count > 0:
+            self.removePositions(segment, range(position, position + count))
+
+    def removePositions(self,
+                        segment: str,
+                        positions: Sequence_T[int],
+                        ) -> None:
+        """Remove defaults|extras at sorted, distinct positions.
+
+        For each model displaying them, items are removed as one row range per
+        contiguous run (last run first); if none do, in a single pass.
+        """
+        if not len(positions):
+            return
+        items = self._writable(segment)
+        data = self.user_data[segment]
+        runs = get_runs(positions)
+        texts = [items[position] for position in positions]
+        if self._batch is not None:
+            self._batchAboutToChange()
+            self._batch.removing(segment, positions, texts)
+            self.indices[segment].removing(items, positions)
+            if segment == EXTRAS and self.groups is not None:
+                self.groups.removing(positions)
+            compact(items, runs)
+            if data is not None:
+                compact(data, runs)
+            return
+        self.itemsAboutToChange.emit()
+        self.indices[segment].removing(items, positions)
+        if segment == EXTRAS and self.groups is not None:
+            self.groups.removing(positions)
+        shown = [model for model in self.models
+                 if model.offset(segment) is not None]
+        if not len(shown):
+            compact(items, runs)
+            if data is not None:
+                compact(data, runs)
+        else:
+            for start, count in reversed(runs):
+                for model in shown:
+                    first = model.offset(segment) + start
+                    model.beginRemoveRows(QModelIndex(), first, first + count - 1)
+                del items[start:start + count]
+                if data is not None:
+                    del data[start:start + count]
+                for model in shown:
+                    model.endRemoveRows()
+        for model in self.models:
+            model._settle()
+        if self.allItemsModel is not None:
+            offset = self._offset(segment)
+            self.allItemsModel.removePositions(positions if not offset else
+                                               [offset + position for position in positions])
+        # completion engine
+        if self.completion is not None:
+            self._updateEngine(self.completion.remove, texts)
+        self.itemsChanged.emit()
+        if segment == EXTRAS:
+            extras_index = self.indices[EXTRAS]
+            self.extrasRemoved.emit({text
+                                     for text in texts
+                                     if text not in extras_index})
+
+    def _groupInserted(self,
+                       segment: str,
+                       position: int,
+                       count: int,
+                       group: Optional_T[str],
+                       ) -> None:
+        if segment != EXTRAS or self.groups is None:
+            return
+        groups = self.groups
+        i_group = groups.group(position) if group is None else groups.find(group)
+        if i_group < 0 or not len(groups):
+            i_group = groups.add('' if group is None else group)
+        groups.inserted(i_group, count)
+
+    # --- Completion ---
+
+    def query(self, text: str, limit: int) -> List_T[str]:
+        """Query the completion engine from a completion pool worker.
+
+        Item changes made meanwhile do not wait for the query: their engine
+        updates are queued, and applied on the GUI thread once no query is
+        in flight.
+        """
+        with self.lock:
+            self._n_querying += 1
+        try:
+            with self._queryLock:
+                return self.completion.query(text, limit)
+        finally:
+            with self.lock:
+                self._n_querying -= 1
+                done = not self._n_querying and len(self._engine_updates)
+            if done:
+                try:
+                    self._queriesDone.emit()
+                except RuntimeError:  # catalog deleted
+                    pass
+
+    def _updateEngine(self, update: Callable_T, texts: List_T[str]) -> None:
+        """Apply update(texts) to the engine, or queue it whilst queries are in flight."""
+        with self.lock:
+            if self._n_querying:
+                self._engine_updates.append((update, list(texts)))
+                return
+            self._applyEngineUpdates()  # (queued first, in order)
+            update(texts)
+
+    def _flushEngine(self) -> None:
+        with self.lock:
+            if not self._n_querying:
+                self._applyEngineUpdates()
+
+    def _applyEngineUpdates(self) -> None:
+        updates, self._engine_updates = self._engine_updates, list()
+        for update, texts in updates:
+            update(texts)
+
+    # --- Batching ---
+
+    def batching(self) -> bool:
+        return self._batch is not None
+
+    @contextmanager
+    def batchUpdate(self) -> Iterator_T['ItemCatalog']:
+        """Make changes within the block, and announce only their net effect after.
+
+        Items, indices and userData change as usual, but models are not told
+        row by row: once the outermost block exits, each attached model is
+        reset (and the completion engine updated) once, if anything changed.
+        Changes that cancel out (e.g. adding then removing) announce nothing.
+        """
+        outermost = self._batch is None
+        if outermost:
+            self._batch = CatalogBatch(self)
+        try:
+            yield self
+        finally:
+            if outermost:
+                batch, self._batch = self._batch, None
+                self._endBatch(batch)
+
+    def _batchAboutToChange(self) -> None:
+        if not self._batch.announced:
+            self._batch.announced = True
+            self.itemsAboutToChange.emit()
+
+    def _endBatch(self, batch: CatalogBatch) -> None:
+        changed = batch.isChanged(self)
+        if changed and self.allItemsModel is not None:
+            self.allItemsModel.setStringList(list(self.all_items))
+        for model in self.models:
+            if changed or model._stale:
+                model.reset()
+        if changed and self.completion is not None:
+            net = Counter(batch.added)
+            net.subtract(batch.removed)
+            self._updateEngine(self.completion.remove,
+                               [text for text, count in net.items() if count < 0
+                                for _ in range(-count)])
+            self._updateEngine(self.completion.add,
+                               [text for text, count in net.items() if count > 0
+                                for _ in range(count)])
+        if batch.announced:
+            self.itemsChanged.emit()
+        if changed and len(batch.removedExtras):
+            extras_index = self.indices[EXTRAS]
+            self.extrasRemoved.emit({text
+                                     for text in batch.removedExtras
+                                     if text not in extras_index})
+
+    # --- Extras Provider ---
+
+    def canFetchMore(self) -> bool:
+        return (self._fetch is not None
+                and self._fetching is None)
+
+    def fetchExtras(self, limit: int = None) -> List_T[str]:
+        """Append the next page of extras from the provider, if any.
+
+        An async page is scheduled instead, and nothing is returned.
+        """
+        if not self.canFetchMore():
+            return []
+        limit = self.nFetch if limit is None else limit
+        page = self._fetch(limit)
+        if isinstance(page, Awaitable):
+            self._fetching = schedule(page, lambda page: self._pageReady.emit(page, limit))
+            return []
+        return self._addPage(page, limit)
+
+    def stopFetching(self) -> None:
+        """Drop the provider, cancelling any pending page."""
+        if self._fetching is not None:
+            self._fetching.cancel()
+            self._fetching = None
+        self._fetch = None
+
+    def _addPage(self, page: Optional_T[List_T[str]], limit: int) -> List_T[str]:
+        self._fetching = None
+        if (page is None  # failed, retry on next fetch
+        or self._fetch is None):  # stopped whilst pending
+            return []
+        if len(page) < limit:  # exhausted
+            self._fetch = None
+        expanders = {model.expander for model in self.models}
+        page = [text for text in page if text not in expanders]
+        if self.unique:
+            kept, _ = self._distinct(page)
+            page = [page[i_text] for i_text in kept]
+        if len(page):
+            self.insertItems(EXTRAS, len(self.extras), page)
+            self.fetched.emit(page)
+        return page
+
+
+class FrozenCatalog(ItemCatalog):
+    """ItemCatalog of items that never change, held as tuples.
+
+    Tuples given are held without copying (other sequences are copied to a
+    tuple once), so any number of boxes can share one catalog with no
+    copies of its items. Adding or removing items raises TypeError.
+    """
+    def __init__(self,
+                 defaults: Sequence_T[str] = (),
+                 extras: T_Union[Sequence_T[str], Mapping_T[str, Sequence_T[str]]] = (),
+                 completion: T_Union[CompletionEngine, Callable_T] = None,
+                 parent: QObject = None,
+                 ) -> None:
+        super().__init__(tuple(defaults),
+                         extras if isinstance(extras, Mapping) else tuple(extras),  # (grouped)
+                         completion, parent=parent)
+
+    def insertItems(self, *_, **__) -> None:
+        raise TypeError('FrozenCatalog items cannot be changed')
+
+    def removePositions(self, segment: str, positions: Sequence_T[int]) -> None:
+        if len(positions):
+            raise TypeError('FrozenCatalog items cannot be changed')
+
+    def stopFetching(self) -> None:
+        pass  # (no provider)
+
+
+# --- View ---
+
+class PopupDelegate(QStyledItemDelegate):
+    """Item delegate sizing every row alike, without reading its item.
+
+    The size is measured once per font and icon size, with room for an icon
+    (so history rows are no taller than the others).
+    """
+    def __init__(self, parent: QObject = None) -> None:
+        super().__init__(parent)
+        self._size_key = None
+        self._size = QSize()
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:
+        size_key = (option.font.key(), option.decorationSize)
+        if size_key != self._size_key:
+            self._size_key = size_key
+            self._size = self._measure(option)
+        return self._size
+
+    def _measure(self, option: QStyleOptionViewItem) -> QSize:
+        option = QStyleOptionViewItem(option)
+        option.features |= QStyleOptionViewItem.HasDisplay | QStyleOptionViewItem.HasDecoration
+        option.text = 'Xy'
+        widget = option.widget
+        style = QApplication.style() if widget is None else widget.style()
+        return style.sizeFromContents(QStyle.CT_ItemViewItem, option, QSize(), widget)
+
+
+class PopupView(QListView):
+    """Popup list whose layout and painting scale with the visible rows.
+
+    Rows share one size (from PopupDelegate), so none is measured to lay out
+    the list, and rows are laid out in batches (the first batch is shown
+    whilst the rest are laid out between events).
+    """
+    def __init__(self, parent: QObject = None, batch_size: int = 1000) -> None:
+        super().__init__(parent)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(batch_size)
+        self.setItemDelegate(PopupDelegate(self))
 
 
 # --- Main ---
 
+COMPLETER_KEYS = (Qt.Key_Escape, Qt.Key_Enter, Qt.Key_Return, Qt.Key_F4)  # (left to an open completer popup)
+
+
 class ExpandoBox(QComboBox):
+    editsCoalesced = Signal(int)  # number of edits skipped in favour of the latest
+    _completionsReady = Signal(int, list)
+
     def __init__(self,
                  parent=None,
                  defaults: List_T[str] = None,
@@ -72,35 +1557,67 @@ class ExpandoBox(QComboBox):
                  placeholder: str = '',
                  expander: str = '...',
                  copy: bool = True,
+                 completion: T_Union[CompletionEngine, Callable_T] = None,
+                 n_completions: int = 100,
+                 completion_pool: QThreadPool = None,
+                 debounce_ms: int = None,
+                 n_fetch_extras: int = 100,
+                 catalog: ItemCatalog = None,
+                 compact: bool = False,
+                 history_store: 'HistoryStore' = None,
+                 history_id: str = None,
+                 frecency: Frecency = None,
+                 timings: Timings = None,
+                 paged: bool = False,
+                 more: str = 'more…',
                  ) -> None:
-        
+        start = perf_counter()
         defaults = [] if defaults is None else defaults
         extras = [] if extras is None else extras
+        completion = as_engine(completion)
         self._verify_init(locals())
 
         super().__init__(parent)
+        # instrumentation (opt-in)
+        self._timings = timings
         
-        self.uniqueItemText = unique
-        if copy:
-            # separate internal state from external source
-            defaults = deepcopy(defaults)
-            extras = deepcopy(extras)
-        self._defaults = defaults
-        self._extras = extras
-        self._history_extras: Deck_T[str] = deck([], maxlen=n_history)
-        self._history_idxs: Deck_T[int] = deck([], maxlen=n_history)
+        if catalog is None:
+            if copy and not compact:  # (a compact store is a copy)
+                # separate internal state from external source
+                # (texts are immutable, and immutable sequences are copied on write)
+                if isinstance(defaults, MutableSequence):
+                    defaults = list(defaults)
+                if isinstance(extras, MutableSequence):
+                    extras = list(extras)
+            catalog = ItemCatalog(defaults, extras, completion, n_fetch_extras,
+                                  parent=self, compact=compact, unique=unique)
+        self._verify_items(catalog, expander)
+        # items (possibly shared)
+        self._catalog = catalog
+        self.uniqueItemText = catalog.unique  # (a given catalog's own, as it holds the items)
+        # history: text -> text if unique, else selected row -> text
+        # (ranked by frecency, if given: it may be shared between boxes)
+        self._frecency = frecency
+        self._history_extras = History(maxlen=n_history,
+                                       rank=None if frecency is None else frecency.weight)
+        self._historyStore = history_store
+        self._history_id = history_id
+        self._history_loaded = history_store is None  # (loaded on first display)
         # expansion & display
         self._expander = expander
         self._is_expanded = False
-        if len(self._defaults):
-            # defaults only
-            self.addItems(self._defaults)
-            if len(self._extras):
-                # defaults, expander
-                self.addItem(expander)
-        elif len(self._extras):
-            # extras only
-            self.addItems(self._extras)
+        # defaults only:   *defaults
+        # extras only:     *extras
+        # both:            *defaults, expander
+        self._model = ExpandoModel(catalog,
+                                   self._history_extras,
+                                   expander,
+                                   icon=partial(get_icon, clock, 10),  # (not holding the box)
+                                   parent=self,
+                                   page=n_show_extras if paged else None,
+                                   more=more)
+        self.setView(PopupView(self))
+        self.setModel(self._model)
 
         # user editing
         self.setEditable(True)
@@ -108,40 +1625,122 @@ class ExpandoBox(QComboBox):
         line_edit = self.lineEdit()
         self.line_edit = line_edit
         # completer
-        self._all_items = [*self._defaults, *self._extras]
-        self._allItemsStringList = QStringListModel()
-        self._allItemsStringList.setStringList(self._all_items)
-        completer = QCompleter()
-        completer.setModel(self._allItemsStringList)
-        completer.setCompletionMode(completer.PopupCompletion)
-        self.setCompleter(completer)
+        self._all_items = catalog.all_items
+        self._allItemsModel = catalog.allItemsModel
+        completer = self._completer = QCompleter()
+        self._completion = catalog.completion
+        self._n_completions = n_completions
+        self._kept_completion = (False, None)  # popup visible, highlighted text
+        # threaded completion
+        self._completionPool = completion_pool
+        self._query_serial = 0
+        self._completionTask = None  # pending async query
+        if self._completion is None:
+            # QCompleter filters all items
+            completer.setModel(self._allItemsModel)
+            completer.setCompletionMode(completer.PopupCompletion)
+        else:
+            # engine filters, QCompleter shows its top results as given
+            self._completionsModel = CompletionModel([], parent=self)
+            completer.setModel(self._completionsModel)
+            completer.setCompletionMode(completer.UnfilteredPopupCompletion)
+        if debounce_ms is None:
+            self.setCompleter(completer)
+        else:
+            # detached from the editor, which would re-filter it on every edit:
+            # fed once per burst of edits instead, by onTextEdit
+            self.setCompleter(None)  # (nor keep the editor's default, inline one)
+            completer.setWidget(self)
+            completer.highlighted[str].connect(line_edit.setText)
+            completer.activated[str].connect(self._completerActivated)
+            completer.activated[str].connect(line_edit.setText)
+        # edit coalescing: None, immediate | 0, once per event loop pass | >0, after a quiet period
+        self._debounce_ms = debounce_ms
+        self._pending_edit = ''
+        self._n_pending_edits = 0
+        self.nCoalescedEdits = 0
+        self._editTimer = QTimer(self)
+        self._editTimer.setSingleShot(True)
+        self._editTimer.timeout.connect(self.flushTextEdit)
         # display
-        self.setMaxVisibleItems(len(self._defaults) + 1 + n_show_extras)
+        self.setMaxVisibleItems(len(self._defaults) + 1 + n_show_extras + paged)
         self.setCurrentText(placeholder)
         self._previous = Previous(-1, placeholder)
-        # icons
-        temp = QObject()
-        svg = QSvgRenderer(bytearray(clock, 'utf-8'), parent=temp)
-        self.pix = QPixmap(10, 10)
-        paint = QPainter(self.pix)
-        svg.render(paint)
-        paint.end()
-        del temp
-        self.clock_icon = QIcon(self.pix)
         # signal connection
         self.activated[int].connect(self.onSelect)
-        line_edit.textEdited[str].connect(self.onTextEdit)
+        if debounce_ms is None:
+            line_edit.textEdited[str].connect(self.onTextEdit)
+        else:
+            line_edit.textEdited[str].connect(self.queueTextEdit)
         self.completer().activated[str].connect(self.onCompleteSelect)
+        self._completionsReady.connect(self.onCompletionsReady, Qt.QueuedConnection)
+        catalog.itemsAboutToChange.connect(self._saveCompletion)
+        catalog.itemsChanged.connect(self._restoreCompletion)
+        catalog.extrasRemoved.connect(self.onExtrasRemoved)
+        self._kept_edit = (-1, '')  # current index, editor text (across a model reset)
+        self._model.modelAboutToBeReset.connect(self._saveEdit)
+        self._model.modelReset.connect(self._restoreEdit)
+        # first page of extras (if from a provider, and not yet fetched)
+        if not len(self._extras):
+            catalog.fetchExtras()
+        if timings is not None:
+            timings.record('init', perf_counter() - start, self._nItems())
 
         # line_edit.returnPressed.connect(self.onReturnPress)  # debugging (exit a frozen widget)
 
+    @property
+    def _defaults(self) -> Sequence_T[str]:
+        return self._catalog.defaults
+
+    @property
+    def _extras(self) -> Sequence_T[str]:
+        return self._catalog.extras
+
+    @property
+    def clock_icon(self) -> QIcon:
+        """History icon (shared), rendered on first use."""
+        return get_icon(clock, 10, self.devicePixelRatioF())
+
+    def batchUpdate(self) -> ContextManager_T[ItemCatalog]:
+        """Context in which changes to items are announced once, by their net effect.
+
+        See ItemCatalog.batchUpdate (which applies to every box sharing the catalog).
+        """
+        return self._catalog.batchUpdate()
+
+    def timings(self) -> Optional_T[Timings]:
+        return self._timings
+
+    def setTimings(self, timings: Optional_T[Timings]) -> None:
+        """Record calls of public operations and signal handlers in timings (None to stop)."""
+        self._timings = timings
+
+    def _nItems(self) -> int:
+        return len(self._defaults) + len(self._extras)
+
     # --- Signal Handlers ---
 
+    @timed
     def onSelect(self, index: int, text: str = None) -> None:
+        segment, i_item = None, -1  # (of a row from the popup, not of a given text)
         if text is None:
+            segment, i_item = self._model.locate(index)
             text = self.itemText(index)
+        if segment == EXTRAS and self._model.groups is not None:
+            # (rows of grouped extras are keyed as if all extras were displayed)
+            index = len(self._defaults) + 1 + i_item
 
-        if text == self._expander:  # expander selected
+        if segment in (GROUP, MORE):  # group header, or more extras, selected
+            if segment == GROUP:
+                self.toggleGroup(i_item)
+            else:
+                self.showMoreExtras()
+            self.showPopup()  # keep combo list open
+            self.setCurrentText(self._previous.text)
+            self.setCurrentIndex(self._previous.index)
+            self.setEditText('')
+
+        elif text == self._expander:  # expander selected
             if not self._is_expanded:
                 self.toggleExtras()  # expand
             else:
@@ -156,15 +1755,15 @@ class ExpandoBox(QComboBox):
         
         elif self._is_expanded:  # non-expander item selected, whilst popup is expanded
             self._previous = Previous(index, text)
+            self._score(text)
 
-            # if extra selected, update history
+            # if extra selected, update history (ranked: reselection moves to front)
             if (index > len(self._defaults)):
-                if self.uniqueItemText: 
-                    if text not in self._history_extras:
-                        self._history_extras.appendleft(text)
-                elif index not in self._history_idxs:
-                    self._history_extras.appendleft(text)
-                    self._history_idxs.appendleft(index)
+                key = text if self.uniqueItemText else index
+                self.loadHistory()
+                if (key not in self._history_extras
+                or self._frecency is not None):
+                    self.pushHistory(text, key)
 
             # collapse
             self.toggleExtras()
@@ -173,21 +1772,84 @@ class ExpandoBox(QComboBox):
             self._is_expanded = False  # reset expansion
         else:
             self._previous = Previous(index, text)
-            
+            self._score(text)
+
+    def _score(self, text: str) -> None:
+        """Count a selection towards frecency, re-ranking history if it holds text."""
+        if self._frecency is None:
+            return
+        self._frecency.select(text)
+        history = self._history_extras
+        if (text in history if self.uniqueItemText
+            else any(entry == text for entry in history)):
+            self._model.rerankHistory()
+
+    @timed
     def onTextEdit(self, text: str) -> None:
+        if self._completion is not None:
+            self.updateCompletions(text)
+        if self._debounce_ms is not None:  # detached completer
+            self._complete(text)
+
         if text == '':  # blank editor
             self.showPopup()  # show all options
         else:
             super().hidePopup()  # prioritise completer popup when editing
             self.grabKeyboard()
     
+    def queueTextEdit(self, text: str) -> None:
+        """Defer onTextEdit until edits settle; the editor still echoes every edit."""
+        self._pending_edit = text
+        self._n_pending_edits += 1
+        self._editTimer.start(self._debounce_ms)  # restart
+
+    @timed
+    def flushTextEdit(self) -> None:
+        """Handle the latest of any queued edits now."""
+        self._editTimer.stop()
+        n_edits = self._n_pending_edits
+        if not n_edits:
+            return
+        self._n_pending_edits = 0
+        if n_edits > 1:
+            self.nCoalescedEdits += n_edits - 1
+            self.editsCoalesced.emit(n_edits - 1)
+        self.onTextEdit(self._pending_edit)
+
+    @timed
+    def onCompletionsReady(self, serial: int, results: List_T[str]) -> None:
+        if serial != self._query_serial:  # stale
+            return
+        self._completionsModel.replaceItems(self._ranked(results))
+        if self.line_edit.text():
+            self.completer().complete()  # show (or hide, if no results)
+
+    @timed
+    def onExtrasRemoved(self, texts: Set_T[str]) -> None:
+        # remove from history (if no longer an extra)
+        history = self._history_extras
+        if (self.uniqueItemText
+        and len(texts) < len(history)):  # keyed by text
+            keys = [text for text in texts if text in history]
+        else:
+            keys = [key for key, text in history.items() if text in texts]
+        if len(keys):
+            self._model.removeHistory(keys)
+            if self._historyStore is not None:
+                self._historyStore.remove(self._history_id, keys)
+
+        if not len(self._extras):  # no more extras
+            # hide extras: *default(s), expander, *extras -> *defaults
+            self._is_expanded = False
+            self._model.setExpanded(False)
+
+    @timed
     def onCompleteSelect(self, text):
-        print(text)
-        index = -1
-        for i_item, item in enumerate(self._all_items):
-            if item == text:
-                index = i_item
-                break
+        index = self._model.find(DEFAULTS, text)
+        if index < 0:
+            index = self._model.find(EXTRAS, text)
+            if index >= 0:
+                index += len(self._defaults)
         if index >= len(self._defaults):
             index += 1
             self._is_expanded = True
@@ -195,6 +1857,32 @@ class ExpandoBox(QComboBox):
 
     # --- Utility ---
     
+    def completer(self) -> QCompleter:
+        """The box's completer, whether attached to its editor or (debounced) not."""
+        return self._completer
+
+    @timed
+    def showPopup(self) -> None:
+        if not self._is_expanded:  # history view
+            self.loadHistory()
+        # QComboBox measures up to maxVisibleItems rows to size the popup:
+        # only measure those that fit on screen
+        n_visible = self.maxVisibleItems()
+        n_fit = self._nScreenRows()
+        if n_fit < n_visible:
+            self.setMaxVisibleItems(n_fit)
+            super().showPopup()
+            self.setMaxVisibleItems(n_visible)
+        else:
+            super().showPopup()
+
+    def _nScreenRows(self) -> int:
+        """Popup rows that fit on the box's screen."""
+        screen = QApplication.screenAt(self.mapToGlobal(QPoint())) or QApplication.primaryScreen()
+        row_height = max(1, self.view().sizeHintForRow(0))
+        return screen.availableGeometry().height() // row_height + 1
+
+    @timed
     def hidePopup(self) -> None:
         # if self._is_expanded:
         self.setCurrentText(self._previous.text)
@@ -204,51 +1892,175 @@ class ExpandoBox(QComboBox):
     
     # def onReturnPress(self):  # debugging (exit a frozen widget)
     #     exit()
-    
-    def hideExtras(self):
-        idx_start_extras = len(self._defaults) + 1
-        hide = self._extras if self._is_expanded else self._history_extras
-        for _ in hide:
-            self.removeItem(idx_start_extras)
 
+    @timed
+    def updateCompletions(self, text: str) -> None:
+        """Show the completion engine's top results for text.
+
+        With a completion pool, the query runs on a worker and only the
+        results of the latest query are shown. An async query runs as a task
+        on the event loop, and is cancelled when superseded.
+        """
+        self._query_serial += 1
+        if self._completionTask is not None:
+            self._completionTask.cancel()
+            self._completionTask = None
+        if not text:
+            self._completionsModel.replaceItems([])
+        elif isinstance(self._completion, AsyncCompletion):
+            serial = self._query_serial
+            self._completionTask = schedule(
+                self._completion.query(text, self._n_completions),
+                lambda results: self._completionsReady.emit(serial, results or []))
+        elif self._completionPool is None:
+            self._completionsModel.replaceItems(
+                self._ranked(self._completion.query(text, self._n_completions)))
+        else:
+            self._completionPool.start(CompletionQuery(self, self._query_serial, text))
+
+    def keyPressEvent(self, event: QKeyEvent) -> None:
+        """Whilst a detached completer's popup is open, forward keys to the editor,
+        but leave those ending a completion to the popup (as QComboBox and its
+        editor do for an attached completer).
+        """
+        if (self._debounce_ms is not None
+        and self._completer.popup().isVisible()):
+            if event.key() in COMPLETER_KEYS:
+                event.ignore()
+            else:
+                self.line_edit.event(event)
+            return
+        super().keyPressEvent(event)
+
+    def _completerActivated(self, text: str) -> None:
+        """Select the row showing text (if any), as QComboBox does for its editor's completer."""
+        row = self.findText(text, Qt.MatchFixedString | Qt.MatchCaseSensitive)
+        self.setCurrentIndex(row)
+        if row >= 0:
+            self.activated[int].emit(row)
+
+    def _complete(self, text: str) -> None:
+        """Filter the completer by text and show its popup, as the editor does on each edit."""
+        completer = self._completer
+        if not text:
+            completer.popup().hide()
+            return
+        completer.setCompletionPrefix(text)
+        completer.complete()
+
+    def _ranked(self, results: List_T[str]) -> List_T[str]:
+        """Completion results by frecency (only those shown are ranked)."""
+        if self._frecency is None:
+            return results
+        return self._frecency.rank(results)
+
+    def _saveEdit(self) -> None:
+        self._kept_edit = (self.currentIndex(), self.line_edit.text())
+
+    def _restoreEdit(self) -> None:
+        """Keep the selection and editor text through a model reset (e.g. after a batch)."""
+        index, text = self._kept_edit
+        self.setCurrentIndex(index if index < self.count() else -1)
+        self.setEditText(text)
+
+    def _saveCompletion(self) -> None:
+        popup = self.completer().popup()
+        visible = popup.isVisible()
+        self._kept_completion = (visible, popup.currentIndex().data() if visible else None)
+
+    @timed
+    def _restoreCompletion(self) -> None:
+        """Restore the highlighted completion after the completer model changes.
+
+        QCompleter re-filters (and so resets its popup) on any source row
+        change; the popup itself stays open. With a completion engine, the
+        open popup's results are re-queried.
+        """
+        visible, current = self._kept_completion
+        self._kept_completion = (False, None)
+        popup = self.completer().popup()
+        if (visible
+        and self._completion is not None):
+            self.updateCompletions(self.completer().completionPrefix())
+        if current is not None:
+            completions = self.completer().completionModel()
+            matches = completions.match(completions.index(0, 0), Qt.DisplayRole, current,
+                                        1, Qt.MatchExactly)
+            if len(matches):
+                popup.setCurrentIndex(matches[0])
+
+    @timed
     def toggleExtras(self):
-        idx_start_extras = len(self._defaults) + 1
+        # collapse: *defaults, expander, *extras -> *defaults, expander, *history
+        # expand: *defaults, expander, *history -> *defaults, expander, *extras
         if self._is_expanded:
-            # collapse: *defaults, expander, *extras -> *defaults, expander, *history
-            for _ in self._extras:
-                self.removeItem(idx_start_extras)
-            for item in self._history_extras:
-                self.addItem(self.clock_icon, item)
-        else:
-            # expand: *defaults, expander, *history -> *defaults, expander, *extras
-            for _ in self._history_extras:
-                self.removeItem(idx_start_extras)
-            for item in self._extras:
-                self.addItem(item)
+            self.loadHistory()
+        self._model.setExpanded(not self._is_expanded)
+
+    @timed
+    def toggleGroup(self, group: T_Union[int, str]) -> None:
+        """Open (or close) a group of extras, by number or name."""
+        model = self._model
+        i_group = group if isinstance(group, int) else model.groups.find(group)
+        model.setGroupOpen(i_group, not model.isGroupOpen(i_group))
+
+    @timed
+    def showMoreExtras(self) -> None:
+        """Reveal the next page of extras, if paged and expanded."""
+        self._model.showMore()
+
+    # --- History ---
+
+    @timed
+    def loadHistory(self) -> None:
+        """Load persisted history, once (on first display, or before first change)."""
+        if self._history_loaded:
+            return
+        self._history_loaded = True
+        history = self._history_extras
+        entries = self._historyStore.load(self._history_id, history.maxlen)
+        stale = [key for key, text in entries if not self._isExtra(key, text)]
+        if len(stale):  # (extras removed since stored)
+            self._historyStore.remove(self._history_id, stale)
+        stale = set(stale)
+        self._model.extendHistory([(key, text) for key, text in entries if key not in stale])
+
+    @timed
+    def pushHistory(self, text: str, key: Hashable_T = None) -> None:
+        history = self._history_extras
+        key = text if key is None else key
+        if self._historyStore is not None:
+            if (key not in history
+            and history.isFull()
+            and history.maxlen):
+                self._historyStore.remove(self._history_id, (history.oldest(),))  # evicted
+            if history.maxlen != 0:
+                self._historyStore.push(self._history_id, key, text)
+        self._model.pushHistory(text, key)
+
+    def _isExtra(self, key: Hashable_T, text: str) -> bool:
+        """Whether a history entry still refers to an extra."""
+        if self.uniqueItemText:
+            return key == text and self._model.find(EXTRAS, text) >= 0
+        i_extra = key - len(self._defaults) - 1 if isinstance(key, int) else -1
+        return (0 <= i_extra < len(self._extras)
+                and self._extras[i_extra] == text)
 
     # --- Item Modification(s) ---
 
+    @timed
     def addDefault(self,
                    text: str,
                    userData: object = None,
                    ) -> None:
         if text == self._expander:
-            raise err_add_expander(text)
+            raise err_add_expander(self, text)
 
         # update state
-        n_before = len(self._defaults)
-        self._defaults.append(text)
-        self._all_items.insert(n_before, text)
-        self.insertItem(n_before, text, userData=userData)
-        self._allItemsStringList.setStringList(self._all_items)
-
-        if (n_before == 0
-        and len(self._extras)):  # first default, >=1 extra
-            # show defaults: *extras -> new_default, expander
-            for _ in self._extras:
-                self.removeItem(1)
-            self.addItem(self._expander)
+        # first default, >=1 extra: *extras -> new_default, expander
+        self._catalog.addDefaults((text,), (userData,))
     
+    @timed
     def addExtra(self,
                  text: str,
                  userData: object = None,
@@ -257,144 +2069,78 @@ class ExpandoBox(QComboBox):
             raise err_add_expander(self, text)
 
         # update state
-        n_before = len(self._extras)
-        self._extras.append(text)
-        self._all_items.append(text)
-        self._allItemsStringList.setStringList(self._all_items)
-
-        if (not n_before
-        and len(self._defaults)):  # first extra, >=1 default
-            # show expander: *defaults -> *defaults, expander
-            self.addItem(self._expander)
-
-        elif self._is_expanded:
-            # show new extra: *defaults, expander, *extras -> *defaults, expander, *extras, new_extra
-            self.addItem(text, userData=userData)
+        # first extra, >=1 default: *defaults -> *defaults, expander
+        # expanded: *defaults, expander, *extras -> *defaults, expander, *extras, new_extra
+        self._catalog.addExtras((text,), (userData,))
     
-    def addDefaults(self, texts: List_T[str]) -> None:
+    @timed
+    def addDefaults(self, texts: List_T[str], skip_repeats: bool = False) -> None:
+        """Add defaults; if unique, repeats raise one ValueError (or are skipped)."""
         if self._expander in texts:
             raise err_add_expander(self, texts)
 
-        if len(texts):
-            # update state
-            n_before = len(self._defaults)
-            self._defaults.extend(texts)
-            self._all_items[n_before:n_before] = texts
-            self.insertItems(n_before, texts)
-            self._allItemsStringList.setStringList(self._all_items)
-
-            if (not n_before
-            and len(self._extras)):  # first default(s), >=1 extra
-                # show default(s): *extras -> *default(s), expander, *extras
-                self.insertItem(len(self._defaults), self._expander)
+        # update state
+        # first default(s), >=1 extra: *extras -> *default(s), expander
+        self._catalog.addDefaults(texts, skip_repeats=skip_repeats)
     
-    def addExtras(self, texts: List_T[str]) -> None:
+    @timed
+    def addExtras(self,
+                  texts: List_T[str],
+                  skip_repeats: bool = False,
+                  group: str = None,
+                  ) -> None:
+        """Add extras (to a group, if grouped); if unique, repeats raise one ValueError (or are skipped)."""
         if self._expander in texts:
             raise err_add_expander(self, texts)
 
-        if len(texts):
-            # update state
-            n_before = len(self._extras)
-            self._extras.extend(texts)
-            self._all_items.extend(texts)
-            self._allItemsStringList.setStringList(self._all_items)
-
-            if (not n_before
-            and len(self._defaults)):
-                # show expander: defaults -> defaults, expander
-                self.addItem(self._expander)
-
-            elif self._is_expanded:
-                # show new extras: defaults, expander, extras -> defaults, expander, extras, new_extras
-                self.addItems(texts)
+        # update state
+        # first extra(s), >=1 default: defaults -> defaults, expander
+        # expanded: defaults, expander, extras -> defaults, expander, extras, new_extras
+        self._catalog.addExtras(texts, skip_repeats=skip_repeats, group=group)
     
+    @timed
     def removeDefault(self, index_or_item: T_Union[int, str]) -> None:
-        indices = get_indices_to_remove(self._defaults, index_or_item)
-        for index in indices:
-            # update state
-            del self._defaults[index]
-            del self._all_items[index]
-            self.removeItem(index)
-            self._allItemsStringList.setStringList(self._all_items)
-
-            # removal
-            if (not len(self._defaults)
-            and len(self._extras)):  # no more defaults, >=1 extras
-                # hide defaults: *defaults, expander, *extras -> *extras
-                self.removeItem(0)  # remove expander
-                if not self._is_expanded:
-                    self._is_expanded = True
-                    self.addItems(self._extras)
+        self.removeDefaults((index_or_item,))
 
+    @timed
     def removeExtra(self, index_or_item: T_Union[int, str]) -> None:
-        indices = get_indices_to_remove(self._extras, index_or_item)
-        for index in indices:
-            # save state
-            old = self._extras[index]
-            # update state
-            del self._extras[index]
-            n_defaults = len(self._defaults)
-            del self._all_items[n_defaults + index]
-            self._allItemsStringList.setStringList(self._all_items)
-
-            # removal
-            if self._is_expanded:  # popup is showing extras
-                self.removeItem(n_defaults + 1 + index)
-            else:
-                # remove from history (if present)
-                for i_hist, item in enumerate(self._history_extras):
-                    if item == old:
-                        self.removeItem(n_defaults + 1 + i_hist)
-                        del self._history_extras[i_hist]
-                        if self.uniqueItemText:
-                            del self._history_idxs[i_hist]
-                        break
-            
-            if (not len(self._extras)
-            and n_defaults):  # no more extras, >=1 defaults
-                # hide extras: *default(s), expander, *extras -> *defaults
-                self.removeItem(n_defaults)
-                self._is_expanded = False
+        self.removeExtras((index_or_item,))
+
+    @timed
+    def removeDefaults(self,
+                       indices_or_items: T_Union[Iterable_T[T_Union[int, str]],
+                                                 Callable_T[[str], bool]],
+                       ) -> None:
+        """Remove defaults by index and/or text, or those matching a predicate."""
+        # last default(s), >=1 extras: *defaults, expander, *extras -> *extras
+        self._catalog.removeDefaults(indices_or_items)
+
+    @timed
+    def removeExtras(self,
+                     indices_or_items: T_Union[Iterable_T[T_Union[int, str]],
+                                               Callable_T[[str], bool]],
+                     ) -> None:
+        """Remove extras by index and/or text, or those matching a predicate.
+
+        Removed extras also leave the history (see onExtrasRemoved).
+        """
+        self._catalog.removeExtras(indices_or_items)
     
+    @timed
     def clearDefaults(self) -> None:
-        n_defaults = len(self._defaults)
-        # update state
-        if n_defaults:
-            del self._all_items[:n_defaults]
-            for _ in range(n_defaults):
-                self.removeItem(0)
-            if len(self._extras):
-                self.removeItem(0)  # expander
-        # reset state
-        self._defaults = list()
+        self._catalog.clearDefaults()
     
+    @timed
     def clearExtras(self) -> None:
-        n_extras = len(self._extras)
-        # update state
-        if n_extras:
-            n_defaults = len(self._defaults)
-            del self._all_items[n_defaults:]
-            if n_defaults:
-                n_rm = n_extras if self._is_expanded else len(self._history_extras)
-                for _ in range(n_rm):
-                    self.removeItem(n_defaults)
-            else:
-                self.clear()
-        # reset state
-        self._extras = list()
+        self._catalog.clearExtras()
     
+    @timed
     def clearHistory(self) -> None:
-        n_defaults = len(self._defaults)
         # update state
-        if (not self._is_expanded
-            and n_defaults
-            and len(self._extras)):
-                end_index = n_defaults + 1
-                for _ in self._history_extras:
-                    self.removeItem(end_index)
-        # reset state                    
-        self._history_extras.clear()
-        self._history_idxs.clear()
+        self._history_loaded = True
+        self._model.clearHistory()
+        if self._historyStore is not None:
+            self._historyStore.clear(self._history_id)
     
     # --- Argument Verification ---
     def _verify_init(self, args):
@@ -403,35 +2149,58 @@ class ExpandoBox(QComboBox):
                 if key != 'self' and key[0] != '_'}
         args = namedtuple('Args', (args.keys()))(**args)
         errors = list()
-        if args.expander in set((*args.defaults, *args.extras)):
-            errors.append(f"Expander character cannot be a default or extra item: '{args.expander}'")
-        if args.unique:
-            defaults_set = set(args.defaults)
-            extras_set = set(args.extras)
-            unique_errors = list()
-            if len(args.defaults) > len(defaults_set):
-                default_counts = Counter(args.defaults)
-                repeated = [key
-                            for key, count in default_counts.items()
-                            if count > 1]
-                unique_errors.append(f"\tThe following default items were repeated: '{repeated}'")
-            if len(args.extras) > len(extras_set):
-                extra_counts = Counter(args.extras)
-                repeated = [key
-                            for key, count in extra_counts.items()
-                            if count > 1]
-                unique_errors.append(f"\tThe following extra items were repeated: '{repeated}'")
-            shared = defaults_set.intersection(extras_set)
-            if len(shared):
-                unique_errors.append(f"The following items were given as both defaults and extras: '{shared}'")
-            if len(unique_errors):
-                errors.append('Items were required to be unique, but one or more repeat was given.')
+        defaults = args.defaults
+        extras = args.extras if isinstance(args.extras, (Sequence, Mapping)) else ()  # provider
+        completion = args.completion
+        if args.catalog is not None:
+            if (len(defaults)
+            or extras is not args.extras or len(extras)
+            or completion is not None):
+                errors.append("Items and completion are held by the catalog, and cannot also be given")
+            completion = args.catalog.completion
+        if (args.completion_pool is not None
+        and completion is None):
+            errors.append("A completion pool requires a completion engine")
+        if (args.completion_pool is not None
+        and isinstance(completion, AsyncCompletion)):
+            errors.append("An async completion source runs on the event loop, not a completion pool")
+        if (args.history_store is not None
+        and args.history_id is None):
+            errors.append("A history store requires a history id for the box")
+        grouped = (isinstance(args.extras, Mapping) if args.catalog is None
+                   else args.catalog.groups is not None)
+        if args.paged and grouped:
+            errors.append("Paged expansion is of ungrouped extras (groups are opened one at a time)")
+        if args.paged and args.n_show_extras < 1:
+            errors.append(f"Pages must show at least one extra: {args.n_show_extras}")
+        if args.n_fetch_extras < 1:
+            errors.append(f"Extras must be fetched at least one at a time: {args.n_fetch_extras}")
+        if (args.debounce_ms is not None
+        and args.debounce_ms < 0):
+            errors.append(f"Debounce interval cannot be negative: {args.debounce_ms}")
         if len(errors):
             raise ValueError('\n'.join(errors))
 
+    def _verify_items(self,
+                      catalog: ItemCatalog,
+                      expander: str,
+                      ) -> None:
+        """Verify items against the catalog's indices, rather than copies of them."""
+        if any(expander in index
+               for index in catalog.indices.values()):
+            raise ValueError(f"Expander character cannot be a default or extra item: '{expander}'")
+
 
 # --- Error Handling ---
 
+def err_not_grouped(group: str) -> ValueError:
+    return ValueError(f"Extras are not grouped, so cannot be added to group '{group}'")
+
+
+def err_repeats(texts: List_T[str]) -> ValueError:
+    return ValueError(f"Items were required to be unique, but {len(texts)} repeat(s) were given: {texts}")
+
+
 def err_add_expander(self: 'ExpandoBox',
                      text_s: T_Union[str, list[str]]):
     if isinstance(text_s, str):
@@ -0,0 +1,130 @@
+"""
+Persistent history for ExpandoBox.
+
+A HistoryStore keeps the histories of any number of boxes in one SQLite
+file, keyed by a box identifier. Changes are queued in memory and written
+in one transaction per batch: after a quiet period, on load, and at
+shutdown. Selecting an item never waits on disk.
+"""
+
+# stdlib
+import json
+import sqlite3
+import atexit
+from time import time
+from weakref import WeakMethod
+# pypi
+from qtpy.QtCore import QCoreApplication, QObject, QTimer
+# type hints
+from typing import (Hashable as Hashable_T,
+                    Iterable as Iterable_T,
+                    List as List_T,
+                    Optional as Optional_T,
+                    Tuple as Tuple_T)
+
+
+# --- Store ---
+
+def write_at_exit(write: WeakMethod) -> None:
+    write = write()
+    if write is not None:  # (store not collected)
+        write()
+
+
+PUSH, REMOVE, CLEAR = range(3)
+
+
+class HistoryStore(QObject):
+    """Write-behind SQLite store of box histories, keyed by box identifier.
+
+    Keys (a text, or the row it was selected from) are stored as JSON, so
+    they load as they were given. path may be ':memory:'.
+    """
+    schema = ('CREATE TABLE IF NOT EXISTS history ('
+              ' box TEXT NOT NULL,'
+              ' key TEXT NOT NULL,'
+              ' text TEXT NOT NULL,'
+              ' time REAL NOT NULL,'
+              ' PRIMARY KEY (box, key))')
+
+    def __init__(self,
+                 path: str,
+                 flush_ms: int = 1000,
+                 parent: QObject = None,
+                 ) -> None:
+        super().__init__(parent)
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        with self._connection:
+            self._connection.execute(self.schema)
+        self._pending: List_T[tuple] = list()
+        self.nFlushes = 0
+        self._flushTimer = QTimer(self)
+        self._flushTimer.setSingleShot(True)
+        self._flushTimer.setInterval(flush_ms)
+        self._flushTimer.timeout.connect(self.flush)
+        # shutdown
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.flush)
+        atexit.register(write_at_exit, WeakMethod(self._write))
+
+    # --- Queue ---
+
+    def push(self, box_id: str, key: Hashable_T, text: str) -> None:
+        """Make text (under key) the most recent of box_id's history."""
+        self._queue((PUSH, box_id, json.dumps(key), text, time()))
+
+    def remove(self, box_id: str, keys: Iterable_T[Hashable_T]) -> None:
+        for key in keys:
+            self._queue((REMOVE, box_id, json.dumps(key)))
+
+    def clear(self, box_id: str) -> None:
+        self._queue((CLEAR, box_id))
+
+    def _queue(self, change: tuple) -> None:
+        self._pending.append(change)
+        if not self._flushTimer.isActive():
+            self._flushTimer.start()  # first change of a batch
+
+    # --- Storage ---
+
+    def flush(self) -> None:
+        """Write queued changes, in one transaction."""
+        self._flushTimer.stop()
+        self._write()
+
+    def _write(self) -> None:
+        if self._connection is None or not len(self._pending):
+            return
+        pending, self._pending = self._pending, list()
+        with self._connection as connection:
+            for change in pending:
+                if change[0] == PUSH:
+                    connection.execute('INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?)',
+                                       change[1:])
+                elif change[0] == REMOVE:
+                    connection.execute('DELETE FROM history WHERE box = ? AND key = ?',
+                                       change[1:])
+                else:
+                    connection.execute('DELETE FROM history WHERE box = ?',
+                                       change[1:])
+        self.nFlushes += 1
+
+    def load(self,
+             box_id: str,
+             limit: Optional_T[int] = None,
+             ) -> List_T[Tuple_T[Hashable_T, str]]:
+        """box_id's (key, text) entries, most recent first."""
+        self.flush()
+        rows = self._connection.execute(
+            'SELECT key, text FROM history WHERE box = ?'
+            ' ORDER BY time DESC, rowid DESC LIMIT ?',
+            (box_id, -1 if limit is None else limit))
+        return [(json.loads(key), text) for key, text in rows]
+
+    def close(self) -> None:
+        self.flush()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,635 @@
+"""
+Compact item storage for ExpandoBox.
+
+An ItemStore holds its texts once, UTF-8 encoded in one buffer, with arrays
+of their starts and sizes: a few bytes per item beyond the text itself,
+rather than a Python str object (~50 bytes) each. Texts are decoded on access.
+A CompactIndex finds texts in a store by hash without holding them.
+A History holds recently selected texts, most recent first, keyed for O(1)
+membership, move-to-front and deletion. ItemGroups names consecutive runs
+of a list (e.g. extras by vendor), by their sizes.
+"""
+
+# stdlib
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, chain
+from collections import OrderedDict
+from collections.abc import MutableSequence, Sequence
+# type hints
+from typing import (Callable as Callable_T,
+                    Dict as Dict_T,
+                    Hashable as Hashable_T,
+                    Iterable as Iterable_T,
+                    Iterator as Iterator_T,
+                    List as List_T,
+                    Optional as Optional_T,
+                    Sequence as Sequence_T,
+                    Tuple as Tuple_T,
+                    Union as T_Union,)
+
+
+# --- Store ---
+
+class ItemStore(MutableSequence):
+    """Mutable sequence of texts, stored in one UTF-8 buffer with each text's start and size.
+
+    Texts are added at the end of the buffer, wherever inserted: inserting
+    or deleting moves only the offsets after it (a memmove of two arrays),
+    not the buffer, nor re-offsets. The bytes of removed texts are left in
+    the buffer until they outnumber the live ones, when it is compacted.
+    """
+    def __init__(self, texts: Iterable_T[str] = ()) -> None:
+        self._buffer = bytearray()
+        self._starts = array('Q')
+        self._sizes = array('I')
+        self._n_garbage = 0  # bytes of removed texts, left in the buffer
+        self.extend(texts)
+
+    @property
+    def nbytes(self) -> int:
+        return (len(self._buffer)
+                + (self._starts.itemsize + self._sizes.itemsize) * len(self._starts))
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def _span(self, i_item: int) -> Tuple_T[int, int]:
+        start = self._starts[i_item]
+        return start, start + self._sizes[i_item]
+
+    def _slice(self, i_item: int) -> slice:
+        if i_item < 0:
+            i_item += len(self)
+        if not 0 <= i_item < len(self):
+            raise IndexError('ItemStore index out of range')
+        return slice(i_item, i_item + 1)
+
+    def _range(self, key: slice) -> Tuple_T[int, int]:
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            raise ValueError('ItemStore slices must be contiguous')
+        return start, max(start, stop)
+
+    def __getitem__(self, key: T_Union[int, slice]) -> T_Union[str, List_T[str]]:
+        if isinstance(key, slice):
+            start, stop = self._range(key)
+            buffer = self._buffer
+            return [buffer[first:first + size].decode()
+                    for first, size in zip(self._starts[start:stop], self._sizes[start:stop])]
+        if key < 0:
+            key += len(self)
+        if key < 0:
+            raise IndexError('ItemStore index out of range')
+        start, end = self._span(key)  # IndexError if out of range
+        return self._buffer[start:end].decode()
+
+    def __iter__(self) -> Iterator_T[str]:
+        buffer = self._buffer
+        for start, size in zip(self._starts, self._sizes):
+            yield buffer[start:start + size].decode()
+
+    def __contains__(self, text: object) -> bool:
+        return any(item == text for item in self)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return (len(self) == len(other)
+                and all(a == b for a, b in zip(self, other)))
+
+    def __setitem__(self, key: T_Union[int, slice], texts: T_Union[str, Iterable_T[str]]) -> None:
+        if not isinstance(key, slice):
+            key = self._slice(key)
+            texts = (texts,)
+        start, stop = self._range(key)
+        encoded = [text.encode() for text in texts]
+        buffer = self._buffer
+        sizes = array('I', map(len, encoded))
+        starts = array('Q', accumulate(chain((len(buffer),), sizes)))
+        starts.pop()
+        buffer += b''.join(encoded)
+        self._n_garbage += sum(self._sizes[start:stop])
+        self._starts[start:stop] = starts
+        self._sizes[start:stop] = sizes
+        self._collect()
+
+    def __delitem__(self, key: T_Union[int, slice]) -> None:
+        self[key if isinstance(key, slice) else self._slice(key)] = ()
+
+    def insert(self, i_item: int, text: str) -> None:
+        self[i_item:i_item] = (text,)
+
+    def extend(self, texts: Iterable_T[str]) -> None:
+        n_items = len(self)
+        self[n_items:n_items] = texts
+
+    def clear(self) -> None:
+        self._buffer.clear()
+        del self._starts[:]
+        del self._sizes[:]
+        self._n_garbage = 0
+
+    def copy(self) -> 'ItemStore':
+        store = ItemStore()
+        store._buffer[:] = self._buffer
+        store._starts.extend(self._starts)
+        store._sizes.extend(self._sizes)
+        store._n_garbage = self._n_garbage
+        return store
+
+    def deleteRuns(self, runs: Sequence_T[Tuple_T[int, int]]) -> None:
+        """Delete contiguous (start, count) runs in one pass."""
+        starts, sizes = self._starts, self._sizes
+        kept_starts, kept_sizes = array('Q'), array('I')
+        end = 0
+        for start, count in chain(runs, ((len(starts), 0),)):
+            # keep items [end, start)
+            kept_starts.extend(starts[end:start])
+            kept_sizes.extend(sizes[end:start])
+            self._n_garbage += sum(sizes[start:start + count])
+            end = start + count
+        self._starts, self._sizes = kept_starts, kept_sizes
+        self._collect()
+
+    def _collect(self) -> None:
+        """Compact the buffer (in item order) once removed bytes outnumber live ones."""
+        buffer = self._buffer
+        if not len(self._starts):
+            self.clear()
+            return
+        if self._n_garbage <= len(buffer) - self._n_garbage:
+            return
+        view = memoryview(buffer)
+        kept = bytearray().join([view[start:start + size]
+                                 for start, size in zip(self._starts, self._sizes)])
+        view.release()
+        starts = array('Q', accumulate(chain((0,), self._sizes)))
+        starts.pop()
+        self._buffer, self._starts = kept, starts
+        self._n_garbage = 0
+
+
+# --- Index ---
+
+EMPTY, DELETED = -1, -2
+
+
+class CompactIndex:
+    """Hash index from text to position(s) in an ItemStore, holding positions only.
+
+    An open-addressed table of slots (and their texts' hashes), probed by
+    the hash of the text and resolved by reading the store only on a hash
+    match. Same interface and update protocol as ItemIndex: `inserted` after
+    insertion, `removing` before removal. As in ItemIndex, removal leaves
+    tombstones, counted by a Fenwick tree (allocated on the first removal),
+    and a slot's position is the slot less the tombstones before it: so
+    removing costs O(log n) per text, wherever removed. Inserting elsewhere
+    than the end renumbers the slots after it (and purges tombstones), as
+    does removal once tombstones outnumber items. Repeated texts are counted
+    as they are met, so len() (distinct texts) is O(1).
+    """
+    max_load = 0.6
+    batch = 4096  # items read from the store at once
+
+    def __init__(self, items: Sequence_T[str] = ()) -> None:
+        self._items = items
+        self._slots = array('q', [EMPTY] * 8)
+        self._hashes = array('q', bytes(8 * 8))
+        self._n_used = 0  # live + deleted
+        self._n_repeats = 0  # items whose text is held at another position too, less one per text
+        self._tree: Optional_T[array] = None  # Fenwick tree of tombstones, by slot + 1
+        self._n_slots = 0
+        self._n_removed = 0
+        self.inserted(items, 0, len(items))
+
+    def __contains__(self, text: str) -> bool:
+        return self.first(text) >= 0
+
+    def __len__(self) -> int:
+        """Number of distinct texts."""
+        return len(self._items) - self._n_repeats
+
+    def _matches(self, text: str, text_hash: int = None) -> Iterator_T[int]:
+        """Slots holding text."""
+        text_hash = hash(text) if text_hash is None else text_hash
+        slots = self._slots
+        hashes = self._hashes
+        mask = len(slots) - 1
+        items = self._items
+        i_slot = text_hash & mask
+        while slots[i_slot] != EMPTY:
+            slot = slots[i_slot]
+            if (slot >= 0
+            and hashes[i_slot] == text_hash
+            and items[self._position(slot)] == text):
+                yield slot
+            i_slot = (i_slot + 1) & mask
+
+    def first(self, text: str) -> int:
+        """Position of the first occurrence of text, or -1."""
+        slot = min(self._matches(text), default=-1)
+        return -1 if slot < 0 else self._position(slot)
+
+    def positions(self, text: str) -> List_T[int]:
+        return [self._position(slot) for slot in sorted(self._matches(text))]
+
+    def clear(self) -> None:
+        self._slots = array('q', [EMPTY] * 8)
+        self._hashes = array('q', bytes(8 * 8))
+        self._n_used = 0
+        self._n_repeats = 0
+        self._tree = None
+        self._n_slots = 0
+        self._n_removed = 0
+
+    def _place(self, text: str, slot: int, text_hash: int) -> None:
+        """Add slot to the table, counting a repeat if text is held already."""
+        slots = self._slots
+        hashes = self._hashes
+        mask = len(slots) - 1
+        items = self._items
+        i_slot = text_hash & mask
+        i_free = -1
+        repeat = False
+        while slots[i_slot] != EMPTY:  # (to the end of the chain, for repeats)
+            held = slots[i_slot]
+            if held < 0:
+                if i_free < 0:
+                    i_free = i_slot
+            elif (not repeat
+            and hashes[i_slot] == text_hash
+            and held != slot
+            and items[self._position(held)] == text):
+                repeat = True
+            i_slot = (i_slot + 1) & mask
+        if i_free < 0:
+            i_free = i_slot
+            self._n_used += 1
+        slots[i_free] = slot
+        hashes[i_free] = text_hash
+        self._n_repeats += repeat
+
+    def _resize(self, n_items: int) -> None:
+        """Rehash live slots into a table for n_items, by their held hashes."""
+        size = 8
+        while size * self.max_load < n_items:
+            size *= 2
+        old = [(slot, text_hash)
+               for slot, text_hash in zip(self._slots, self._hashes)
+               if slot >= 0]
+        slots = self._slots = array('q', [EMPTY] * size)
+        hashes = self._hashes = array('q', bytes(8 * size))
+        mask = size - 1
+        for slot, text_hash in old:
+            i_slot = text_hash & mask
+            while slots[i_slot] != EMPTY:
+                i_slot = (i_slot + 1) & mask
+            slots[i_slot] = slot
+            hashes[i_slot] = text_hash
+        self._n_used = len(old)
+
+    def inserted(self,
+                 items: Sequence_T[str],
+                 position: int,
+                 count: int,
+                 ) -> None:
+        """Register items[position:position + count], which were just inserted."""
+        self._items = items
+        if position + count < len(items):  # not appended: slots after renumber
+            self._renumber(position, count)
+            first_slot = position
+        else:
+            first_slot = self._n_slots
+        self._addSlots(count)
+        if (self._n_used + count) > len(self._slots) * self.max_load:
+            self._resize(len(items))
+        end = position + count
+        for start in range(position, end, self.batch):  # decoded a batch at a time
+            stop = min(start + self.batch, end)
+            for slot, text in zip(range(first_slot + start - position,
+                                        first_slot + stop - position),
+                                  items[start:stop]):
+                self._place(text, slot, hash(text))
+
+    def removing(self,
+                 items: Sequence_T[str],
+                 positions: Sequence_T[int],
+                 ) -> None:
+        """Unregister the items at sorted, distinct positions, which are about to be removed."""
+        n_positions = len(positions)
+        if not n_positions:
+            return
+        if n_positions >= len(items):
+            self.clear()
+            return
+        slots = self._slots
+        hashes = self._hashes
+        mask = len(slots) - 1
+        removed = list()
+        for position in positions:
+            text = items[position]
+            text_hash = hash(text)
+            i_slot = text_hash & mask
+            while (slots[i_slot] < 0
+            or hashes[i_slot] != text_hash
+            or self._position(slots[i_slot]) != position):
+                i_slot = (i_slot + 1) & mask
+            removed.append(slots[i_slot])
+            slots[i_slot] = DELETED
+            if next(self._matches(text, text_hash), -1) >= 0:  # (still held elsewhere)
+                self._n_repeats -= 1
+        for slot in removed:  # (once read: tombstones move the positions after them)
+            self._bury(slot)
+        if self._n_removed > len(items) - n_positions:  # (more tombstones than items)
+            self._renumber(0, 0)
+
+    # --- Slots ---
+
+    def _position(self, slot: int) -> int:
+        """Slot less the tombstones before it."""
+        if not self._n_removed:
+            return slot
+        tree = self._tree
+        n_before = 0
+        i_node = slot
+        while i_node:
+            n_before += tree[i_node]
+            i_node &= i_node - 1
+        return slot - n_before
+
+    def _bury(self, slot: int) -> None:
+        tree = self._tree
+        if tree is None:
+            tree = self._tree = array('i', [0]) * (self._n_slots + 1)
+        i_node = slot + 1
+        while i_node < len(tree):
+            tree[i_node] += 1
+            i_node += i_node & -i_node
+        self._n_removed += 1
+
+    def _addSlots(self, count: int) -> None:
+        tree = self._tree
+        self._n_slots += count
+        if tree is None:  # (no tombstones yet)
+            return
+        for _ in range(count):  # (each node sums the tombstones it covers)
+            i_node = len(tree)
+            tree.append(self._nBuried(i_node - 1) - self._nBuried(i_node - (i_node & -i_node)))
+
+    def _nBuried(self, n_slots: int) -> int:
+        """Tombstones among the first n_slots."""
+        tree = self._tree
+        total = 0
+        while n_slots:
+            total += tree[n_slots]
+            n_slots &= n_slots - 1
+        return total
+
+    def _renumber(self, position: int, count: int) -> None:
+        """Make slots positions again (purging tombstones), shifting those >= position by count."""
+        tree = self._tree
+        if tree is None and not count:
+            return
+        if tree is None:
+            self._slots = array('q', (slot + count if slot >= position else slot
+                                      for slot in self._slots))
+            return
+        # tombstones before each slot, from the tree's prefix sums
+        n_before = array('q', bytes(8 * len(tree)))
+        for i_node in range(1, len(tree)):
+            n_before[i_node] = n_before[i_node & (i_node - 1)] + tree[i_node]
+        renumbered = (slot - n_before[slot] if slot >= 0 else slot
+                      for slot in self._slots)
+        self._slots = array('q', (slot + count if slot >= position else slot
+                                  for slot in renumbered))
+        self._n_slots -= self._n_removed
+        self._tree = None
+        self._n_removed = 0
+
+
+# --- View ---
+
+class ItemChain(Sequence):
+    """Read-only view of defaults followed by extras, without a list of its own."""
+    def __init__(self, defaults: Sequence_T[str], extras: Sequence_T[str]) -> None:
+        self.defaults = defaults
+        self.extras = extras
+
+    def __len__(self) -> int:
+        return len(self.defaults) + len(self.extras)
+
+    def __getitem__(self, key: T_Union[int, slice]) -> T_Union[str, List_T[str]]:
+        if isinstance(key, slice):
+            return [self[i_item] for i_item in range(*key.indices(len(self)))]
+        n_defaults = len(self.defaults)
+        if key < 0:
+            key += len(self)
+        if key < n_defaults:
+            return self.defaults[key]
+        return self.extras[key - n_defaults]
+
+    def __iter__(self) -> Iterator_T[str]:
+        return chain(self.defaults, self.extras)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return (len(self) == len(other)
+                and all(a == b for a, b in zip(self, other)))
+
+
+# --- Groups ---
+
+class ItemGroups:
+    """Named, consecutive runs of a list, by size.
+
+    The list itself is held elsewhere (e.g. an ItemCatalog's extras), so it
+    can be indexed and searched as one. Kept in step with it by `inserted`
+    and `removing`; `version` counts changes, for views caching group rows.
+    """
+    def __init__(self,
+                 names: Iterable_T[str] = (),
+                 sizes: Iterable_T[int] = (),
+                 ) -> None:
+        self.names: List_T[str] = list(names)
+        self.sizes: List_T[int] = list(sizes)
+        self.version = 0
+        self._starts: Optional_T[List_T[int]] = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def find(self, name: str) -> int:
+        """Group number of name, or -1."""
+        try:
+            return self.names.index(name)
+        except ValueError:
+            return -1
+
+    def starts(self) -> List_T[int]:
+        """Position of each group's first item."""
+        if self._starts is None:
+            self._starts = [0, *accumulate(self.sizes[:-1])] if len(self.sizes) else []
+        return self._starts
+
+    def span(self, i_group: int) -> Tuple_T[int, int]:
+        """(start, stop) positions of a group's items."""
+        start = self.starts()[i_group]
+        return start, start + self.sizes[i_group]
+
+    def group(self, position: int) -> int:
+        """Group number of the item at position (the last group, from its end)."""
+        return max(0, bisect_right(self.starts(), position) - 1)
+
+    def add(self, name: str) -> int:
+        self.names.append(name)
+        self.sizes.append(0)
+        self._changed()
+        return len(self.names) - 1
+
+    def inserted(self, i_group: int, count: int) -> None:
+        self.sizes[i_group] += count
+        self._changed()
+
+    def removing(self, positions: Iterable_T[int]) -> None:
+        """Account for the removal of items at positions."""
+        for position in positions:
+            self.sizes[self.group(position)] -= 1
+        self._changed()
+
+    def clear(self) -> None:
+        self.sizes = [0] * len(self.sizes)
+        self._changed()
+
+    def _changed(self) -> None:
+        self._starts = None
+        self.version += 1
+
+
+# --- History ---
+
+class History(Sequence):
+    """Recent texts, most recent first, as an LRU map of key -> text.
+
+    A key is the text itself unless given (e.g. the row it was selected
+    from, where texts may repeat). Membership, appendleft (including
+    move-to-front of a present key), eviction of the oldest and deletion are
+    O(1), as are the rows of the newest and oldest entries when unranked.
+    Other positional reads use a row list built on first read after a change.
+
+    Given `rank` (text -> weight), rows are ordered by descending weight,
+    then recency, as of the last change (or `rerank`); eviction is still of
+    the least recent.
+    """
+    def __init__(self,
+                 maxlen: Optional_T[int] = None,
+                 rank: Callable_T[[str], float] = None,
+                 ) -> None:
+        self.maxlen = maxlen
+        self.rank = rank
+        self._texts: 'OrderedDict[Hashable_T, str]' = OrderedDict()  # oldest first
+        self._rows: Optional_T[List_T[Hashable_T]] = None  # keys, most recent first
+        self._positions: Optional_T[Dict_T[Hashable_T, int]] = None
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def __iter__(self) -> Iterator_T[str]:
+        if self.rank is None:
+            return reversed(self._texts.values())
+        return map(self._texts.__getitem__, self.keys())
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._texts
+
+    def __getitem__(self, row: int) -> str:
+        return self._texts[self.keys()[row]]
+
+    def keys(self) -> List_T[Hashable_T]:
+        """Keys by row: most recent (or highest ranked) first."""
+        if self._rows is None:
+            self._rows = list(reversed(self._texts))
+            if self.rank is not None:
+                texts, rank = self._texts, self.rank
+                self._rows.sort(key=lambda key: -rank(texts[key]))  # (stable: recency breaks ties)
+        return self._rows
+
+    def items(self) -> Iterator_T[Tuple_T[Hashable_T, str]]:
+        texts = self._texts
+        return ((key, texts[key]) for key in self.keys())
+
+    def row(self, key: Hashable_T) -> int:
+        texts = self._texts
+        if (self.rank is None
+        and self._positions is None
+        and texts):  # (ends without a rebuild)
+            if key == next(reversed(texts)):
+                return 0
+            if key == next(iter(texts)):
+                return len(texts) - 1
+        if self._positions is None:
+            self._positions = {key: row for row, key in enumerate(self.keys())}
+        return self._positions[key]
+
+    def oldest(self) -> Hashable_T:
+        return next(iter(self._texts))
+
+    def rowFor(self, key: Hashable_T, text: str, recent: bool = True) -> int:
+        """Row that text (under key) would take as the most (or least) recent entry.
+
+        Counted among the other keys, so it is the destination of a move.
+        """
+        if self.rank is None:
+            return 0 if recent else len(self._texts) - (key in self._texts)
+        texts, rank = self._texts, self.rank
+        weight = rank(text)
+        if recent:
+            return sum(1 for other, other_text in texts.items()
+                       if other != key and rank(other_text) > weight)
+        return sum(1 for other, other_text in texts.items()
+                   if other != key and rank(other_text) >= weight)
+
+    def rerank(self) -> None:
+        """Re-order rows after a change of rank."""
+        self._changed()
+
+    def isFull(self) -> bool:
+        return (self.maxlen is not None
+                and len(self._texts) >= self.maxlen)
+
+    def appendleft(self, text: str, key: Hashable_T = None) -> None:
+        """Make text (under key) the most recent, evicting the oldest if full."""
+        if not self.maxlen and self.maxlen is not None:
+            return
+        key = text if key is None else key
+        texts = self._texts
+        if key in texts:
+            texts.move_to_end(key)
+        elif self.isFull():
+            texts.popitem(last=False)
+        texts[key] = text
+        self._changed()
+
+    def append(self, text: str, key: Hashable_T = None) -> None:
+        """Make text (under key) the oldest, if absent and there is room."""
+        key = text if key is None else key
+        if key in self._texts or self.isFull():
+            return
+        self._texts[key] = text
+        self._texts.move_to_end(key, last=False)
+        self._changed()
+
+    def remove(self, key: Hashable_T) -> None:
+        del self._texts[key]
+        self._changed()
+
+    def clear(self) -> None:
+        self._texts.clear()
+        self._changed()
+
+    def _changed(self) -> None:
+        self._rows = None
+        self._positions = None
+        if self.rank is not None:
+            self.keys()  # (rows stay as displayed until the next change)
@@ -0,0 +1,101 @@
+"""
+Opt-in timing of ExpandoBox operations.
+
+Methods decorated with `timed` check their box's Timings; without one (the
+default) they only pay that check. With one, each call's duration and the
+box's item count are recorded against the method's name, and announced by
+the `recorded` signal (e.g. to forward to a metrics pipeline).
+"""
+
+# stdlib
+from time import perf_counter
+from functools import wraps
+# pypi
+from qtpy.QtCore import Signal, QObject
+# type hints
+from typing import (Callable as Callable_T,
+                    Dict as Dict_T)
+
+
+# --- Stats ---
+
+class OperationStats:
+    """Calls of one operation: count, total and max seconds, and the latest item count."""
+    __slots__ = ('count', 'total', 'max', 'items')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+        self.items = 0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.
+
+    def asDict(self) -> Dict_T[str, float]:
+        return {'count': self.count,
+                'total': self.total,
+                'mean': self.mean,
+                'max': self.max,
+                'items': self.items}
+
+    def __repr__(self) -> str:
+        return (f'OperationStats(count={self.count}, total={self.total:.6f}, '
+                f'max={self.max:.6f}, items={self.items})')
+
+
+class Timings(QObject):
+    """Stats by operation name, for one or more boxes.
+
+    Times are inclusive: an operation calling another (e.g. onSelect calling
+    toggleExtras) counts the time of both.
+    """
+    recorded = Signal(str, float, int)  # operation, seconds, items
+
+    def __init__(self, parent: QObject = None) -> None:
+        super().__init__(parent)
+        self.stats: Dict_T[str, OperationStats] = dict()
+
+    def record(self, operation: str, seconds: float, n_items: int) -> None:
+        stats = self.stats.get(operation)
+        if stats is None:
+            stats = self.stats[operation] = OperationStats()
+        stats.count += 1
+        stats.total += seconds
+        if seconds > stats.max:
+            stats.max = seconds
+        stats.items = n_items
+        self.recorded.emit(operation, seconds, n_items)
+
+    def report(self) -> Dict_T[str, Dict_T[str, float]]:
+        """Stats as plain dicts, slowest total first."""
+        return {operation: stats.asDict()
+                for operation, stats in sorted(self.stats.items(),
+                                               key=lambda item: -item[1].total)}
+
+    def reset(self) -> None:
+        self.stats.clear()
+
+
+# --- Hook ---
+
+def timed(method: Callable_T) -> Callable_T:
+    """Record calls of method in its instance's `_timings`, if any.
+
+    The instance reports its item count through `_nItems()`.
+    """
+    operation = method.__name__.lstrip('_')
+
+    @wraps(method)
+    def timed_method(self, *args, **kwargs):
+        timings = self._timings
+        if timings is None:
+            return method(self, *args, **kwargs)
+        start = perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            timings.record(operation, perf_counter() - start, self._nItems())
+
+    return timed_method
@@ -0,0 +1,209 @@
+"""
+
+TODO:
+    - docstrings
+"""
+
+# stdlib
+import re
+# local
+from pycuties.completion import (CompletionEngine, PrefixEngine, FuzzyEngine, Frecency,
+                                 PREFIX, WORD_START, SUBSTRING, FUZZY,)
+
+# testing
+import pytest
+from hypothesis import (given,
+                        strategies as st,)
+# type hinting
+from typing import List as List_T
+
+
+# --- Utility ---
+
+# hypothesis
+text = st.text(alphabet='abcAB ', max_size=4)
+texts = st.lists(text, max_size=100)
+boolean = st.booleans()
+limit = st.integers(1, 20)
+
+
+def brute_prefix(items: List_T[str],
+                 prefix: str,
+                 case_sensitive: bool,
+                 ) -> List_T[str]:
+    fold = (lambda s: s) if case_sensitive else str.casefold
+    return sorted({item for item in items if fold(item).startswith(fold(prefix))},
+                  key=lambda item: (fold(item), item))
+
+
+def brute_tier(item: str, query: str) -> int:
+    item = item.casefold()
+    query = query.casefold()
+    if item.startswith(query):
+        return PREFIX
+    if any(item[match.start():].startswith(query)
+           for match in re.finditer(r'\b\w', item)):
+        return WORD_START
+    if query in item:
+        return SUBSTRING
+    return FUZZY
+
+
+# --- Main ---
+
+class TestCompletionEngine:
+    def test_incomplete(_, ):
+        """An engine missing part of the interface fails when created, not when queried."""
+        # --- Prep ---
+        class AddOnly(CompletionEngine):
+            def add(self, texts):
+                pass
+
+        # --- Act & Check ---
+        with pytest.raises(TypeError):
+            AddOnly()
+
+
+class TestPrefixEngine:
+    @given(items = texts,
+           removed = texts,
+           prefix = text,
+           case_sensitive = boolean,
+           n_limit = limit)
+    def test_query(_, items: List_T[str],
+                      removed: List_T[str],
+                      prefix: str,
+                      case_sensitive: bool,
+                      n_limit: int,
+                      ):
+        # --- Prep ---
+        engine = PrefixEngine(case_sensitive=case_sensitive)
+        engine.add(items)
+        remaining = list(items)
+        for item in removed:  # removing an absent text is ignored
+            if item in remaining:
+                remaining.remove(item)
+
+        # --- Act ---
+        engine.remove(removed)
+        results = engine.query(prefix, n_limit)
+
+        # --- Check ---
+        expected = brute_prefix(remaining, prefix, case_sensitive)
+        assert len(results) == min(n_limit, len(expected))
+        assert set(results) <= set(expected)
+        if case_sensitive:
+            assert results == expected[:n_limit]
+
+    @given(batches = st.lists(texts, min_size=2, max_size=5),
+           prefix = text)
+    def test_incremental(_, batches: List_T[List_T[str]],
+                            prefix: str,
+                            ):
+        """Small and large batches leave the same index as one bulk add."""
+        # --- Prep ---
+        engine = PrefixEngine()
+        engine.rebuild_batch = 8
+        bulk = PrefixEngine()
+
+        # --- Act ---
+        for batch in batches:
+            engine.add(batch)
+        bulk.add([item for batch in batches for item in batch])
+
+        # --- Check ---
+        assert len(engine) == len(bulk)
+        assert engine.query(prefix, 1_000) == bulk.query(prefix, 1_000)
+
+
+class TestFuzzyEngine:
+    @given(items = st.lists(st.text(alphabet='abc ', max_size=8), max_size=60),
+           removed = texts,
+           query = st.text(alphabet='abc ', min_size=1, max_size=4),
+           n_limit = limit)
+    def test_ranking(_, items: List_T[str],
+                        removed: List_T[str],
+                        query: str,
+                        n_limit: int,
+                        ):
+        # --- Prep ---
+        engine = FuzzyEngine()
+        engine.add(items)
+        remaining = list(items)
+        for item in removed:
+            if item in remaining:
+                remaining.remove(item)
+        engine.remove(removed)
+
+        # --- Act ---
+        ranked = engine.rank(query, n_limit)
+
+        # --- Check ---
+        results = [result for result, _ in ranked]
+        tiers = [tier for _, tier in ranked]
+        assert len(results) == len(set(results)) <= n_limit
+        assert set(results) <= set(remaining)
+        assert tiers == sorted(tiers)
+        for result, tier in ranked:
+            if tier < FUZZY:
+                assert tier == brute_tier(result, query)
+        exact = {item for item in remaining if brute_tier(item, query) < FUZZY}
+        if len(exact) <= n_limit:
+            assert exact <= set(results)
+
+    def test_example(_, ):
+        # --- Prep ---
+        engine = FuzzyEngine()
+        engine.add(['fresh water system', 'waterfall', 'sweater', 'wine', 'drainage'])
+
+        # --- Act ---
+        ranked = engine.rank('water', 10)
+
+        # --- Check ---
+        assert ranked[:2] == [('waterfall', PREFIX),
+                              ('fresh water system', WORD_START)]
+        assert engine.query('ain', 10) == ['drainage']
+        assert 'waterfall' in engine.query('watr', 10)
+
+
+class TestFrecency:
+    @given(selections = st.lists(st.tuples(st.sampled_from('abcd'),
+                                           st.floats(0, 50)),
+                                 max_size=30))
+    def test_decayed_sum(_, selections):
+        """Ranks by the sum of halved-per-half-life selections, across rebases."""
+        # --- Prep ---
+        now = 0.
+        frecency = Frecency(half_life=1., clock=lambda: now)
+        frecency.max_exponent = 20  # rebase often
+        times = dict()
+
+        # --- Act ---
+        for text, delay in selections:
+            now += delay
+            frecency.select(text)
+            times.setdefault(text, []).append(now)
+
+        # --- Check ---
+        for text, stamps in times.items():
+            expected = sum(2. ** (stamp - now) for stamp in stamps)
+            assert abs(frecency.score(text) - expected) <= 1e-9 * max(1., expected)
+            assert frecency.counts[text] == len(stamps)
+        ranked = frecency.rank('abcde')
+        scores = [frecency.score(text) for text in ranked]
+        assert scores == sorted(scores, reverse=True)
+        assert ranked[-1] == 'e'  # never selected: order kept
+
+    def test_recency_beats_stale_frequency(_, ):
+        # --- Prep ---
+        now = 0.
+        frecency = Frecency(half_life=1., clock=lambda: now)
+
+        # --- Act ---
+        for _ in range(4):
+            frecency.select('often')
+        now = 10.
+        frecency.select('lately')
+
+        # --- Check ---
+        assert frecency.rank(['often', 'lately', 'never']) == ['lately', 'often', 'never']
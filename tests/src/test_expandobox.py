@@ -27,14 +27,26 @@ TODO:
 """
 
 # stdlib
+import sys
+import time
+import textwrap
+import subprocess
+import asyncio
 import random
 from inspect import signature
 from collections import deque as deck
 # pypi
-from qtpy.QtWidgets import QApplication
+from qtpy.QtWidgets import QApplication, QCompleter
+from qtpy.QtCore import QThreadPool, QModelIndex
+from qtpy.QtTest import QTest
 from PyQt5 import sip
 # local
-from pycuties.expandobox import ExpandoBox
+from pycuties.expandobox import (ExpandoBox, ItemIndex, ItemCatalog, FrozenCatalog,
+                                 PopupView, AllItemsModel, get_icon)
+from pycuties.icons import clock
+from pycuties.completion import PrefixEngine, Frecency
+from pycuties.persist import HistoryStore
+from pycuties.timing import Timings
 
 # testing
 import pytest
@@ -143,6 +155,8 @@ def get_items(draw, content: String_T = string,
             # item = draw(content.filter(lambda s: s not in items))
             item = draw(content)
             assume(item not in items)
+            if isinstance(expander, str):
+                assume(item != expander)
             items.add(item)
         items = list(items)
         defaults = items[:n_defaults]
@@ -801,6 +815,145 @@ class TestHistory:
         # xbox.hidePopup()
         sip.delete(xbox)
 
+    def test_move_to_front(_, ):
+        """Re-pushing a historic extra moves its row alone."""
+        # --- Prep ---
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=['a', 'b', 'c'],
+                          n_history=3)
+        model = xbox._model
+        for text in 'abc':
+            model.pushHistory(text)
+        moves = list()
+        model.rowsMoved.connect(lambda _, start, end, __, row: moves.append((start, end, row)))
+        inserts = list()
+        model.rowsInserted.connect(lambda _, start, end: inserts.append((start, end)))
+
+        # --- Act ---
+        model.pushHistory('a')
+
+        # --- Check ---
+        assert moves == [(4, 4, 2)]
+        assert inserts == []
+        assert [xbox.itemText(row) for row in range(xbox.count())] == ['x', '...', 'a', 'c', 'b']
+
+        # --- End ---
+        sip.delete(xbox)
+
+
+class TestPersistentHistory:
+    def test_restart(_, tmp_path):
+        """History is written behind selection, and loaded lazily by a new box."""
+        # --- Prep ---
+        path = str(tmp_path / 'history.sqlite')
+        store = HistoryStore(path, flush_ms=60_000)
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=['a', 'b', 'c'],
+                          history_store=store,
+                          history_id='box')
+        for idx_extra in (0, 2, 1):
+            xbox.onSelect(1)  # expand
+            xbox.onSelect(2 + idx_extra)
+
+        # --- Check ---
+        assert store.nFlushes == 0  # (nothing written whilst selecting)
+
+        # --- Act ---
+        xbox.removeExtra('c')
+        store.close()
+        sip.delete(xbox)
+        store = HistoryStore(path)
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=['a', 'b', 'c'],
+                          history_store=store,
+                          history_id='box')
+
+        # --- Check ---
+        assert xbox.count() == 2  # not yet loaded
+        xbox.showPopup()
+        assert [xbox.itemText(row) for row in range(xbox.count())] == ['x', '...', 'b', 'a']
+
+        # --- End ---
+        xbox.hidePopup()
+        sip.delete(xbox)
+        store.close()
+
+    def test_stale(_, ):
+        """Entries for extras removed since they were stored are dropped on load."""
+        # --- Prep ---
+        store = HistoryStore(':memory:')
+        store.push('box', 'gone', 'gone')
+        store.push('box', 'a', 'a')
+
+        # --- Act ---
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=['a', 'b'],
+                          history_store=store,
+                          history_id='box')
+        xbox.loadHistory()
+        store.flush()
+
+        # --- Check ---
+        assert list(xbox._history_extras) == ['a']
+        assert store.load('box') == [('a', 'a')]
+
+        # --- End ---
+        sip.delete(xbox)
+        store.close()
+
+    def test_verify(_, ):
+        with pytest.raises(ValueError):
+            ExpandoBox(extras=['a'], history_store=HistoryStore(':memory:'))
+
+
+class TestFrecency:
+    def test_history_rows(_, ):
+        """History rows are ranked by use, then recency, and stay in step with the model."""
+        # --- Prep ---
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=['a', 'b', 'c'],
+                          n_history=3,
+                          frecency=Frecency(clock=lambda: 0.))
+        moves = list()
+        xbox._model.rowsMoved.connect(lambda *args: moves.append(args))
+
+        # --- Act ---
+        for idx_extra in (1, 2, 1, 0):
+            xbox.onSelect(1)  # expand
+            xbox.onSelect(2 + idx_extra)
+
+        # --- Check ---
+        assert [xbox.itemText(row) for row in range(xbox.count())] == ['x', '...', 'b', 'a', 'c']
+        assert len(moves) == 0  # (b reselected whilst expanded)
+
+        # --- Act ---
+        for _ in range(2):
+            xbox.onSelect(xbox.findText('c'))  # from the history view
+
+        # --- Check ---
+        assert [xbox.itemText(row) for row in range(xbox.count())] == ['x', '...', 'c', 'b', 'a']
+        assert list(xbox._history_extras) == ['c', 'b', 'a']
+
+        # --- End ---
+        sip.delete(xbox)
+
+    def test_completions(_, ):
+        # --- Prep ---
+        frecency = Frecency()
+        xbox = ExpandoBox(extras=['ab', 'ac', 'ad'],
+                          completion=PrefixEngine(),
+                          frecency=frecency)
+        frecency.select('ad')
+
+        # --- Act ---
+        xbox.updateCompletions('a')
+
+        # --- Check ---
+        assert list(xbox._completionsModel.items) == ['ad', 'ab', 'ac']
+
+        # --- End ---
+        sip.delete(xbox)
+
 
 class TestSelectPostHistory:
     def test_default(_, ):
@@ -914,6 +1067,255 @@ class TestCompleter:
 
         pass
 
+    @given(uniq__defaults__extras = get_items(),
+           new_extras = st.lists(string_not_expander, min_size=1, max_size=10))
+    def test_incremental_model(_, uniq__defaults__extras: GetItems_T,
+                                  new_extras: List_T[str],
+                                  ):
+        """Completer model follows item changes by row range, never by reset."""
+        # --- Prep ---
+        unique, defaults, extras = uniq__defaults__extras
+        xbox = ExpandoBox(defaults=defaults,
+                          extras=extras,
+                          unique=False)
+        completer = xbox.completer()
+        model = completer.model()
+        resets = list()
+        model.modelReset.connect(lambda: resets.append(True))
+        completer.setCompletionPrefix(new_extras[0][:1])  # filtering whilst items change
+
+        # --- Act ---
+        xbox.addExtras(new_extras)
+        xbox.addDefault(new_extras[0])
+        xbox.removeExtra(0)
+        xbox.removeDefault(0)
+        first_new = len(extras) - 1
+        xbox.removeExtras(range(first_new, first_new + len(new_extras), 2))  # scattered
+
+        # --- Check ---
+        assert not resets
+        expected_items = [*defaults[1:], new_extras[0], *extras[1:], *new_extras[1::2]]
+        assert [model.index(i, 0).data() for i in range(model.rowCount())] == expected_items
+        assert xbox._all_items == expected_items
+        prefix = completer.completionPrefix()  # (follows the current text)
+        assert completer.completionCount() == sum(item.startswith(prefix)
+                                                  for item in expected_items)
+
+        # --- End ---
+        sip.delete(xbox)
+
+    @given(items = st.lists(st.sampled_from(('a', 'ab', 'b', '')), max_size=40),
+           data = st.data())
+    def test_all_items_removal(_, items: List_T[str], data: st.DataObject):
+        """Scattered removals (in place or by one copy) are one layout change, filtered once."""
+        # --- Prep ---
+        positions = sorted(data.draw(st.sets(st.sampled_from(range(len(items)))))) \
+                    if len(items) else []
+        kept = [item for i_item, item in enumerate(items) if i_item not in positions]
+        model = AllItemsModel(items)
+        completer = QCompleter(model)
+        completer.setCompletionPrefix('a')
+        emitted = TestBatchUpdate.signals(model)
+
+        # --- Act ---
+        model.removePositions(positions)
+
+        # --- Check ---
+        assert model.stringList() == kept
+        assert len(emitted) <= 1 and 'modelReset' not in emitted
+        assert completer.completionCount() == sum(item.startswith('a') for item in kept)
+
+        # --- End ---
+        sip.delete(completer)
+        sip.delete(model)
+
+    @given(uniq__defaults__extras = get_items(),
+           prefix = string,
+           n_completions = integer_sample(small=True, nonzero=True))
+    def test_prefix_engine(_, uniq__defaults__extras: GetItems_T,
+                              prefix: str,
+                              n_completions: int,
+                              ):
+        # --- Prep ---
+        unique, defaults, extras = uniq__defaults__extras
+        xbox = ExpandoBox(defaults=defaults,
+                          extras=extras,
+                          unique=unique,
+                          completion=PrefixEngine(),
+                          n_completions=n_completions)
+        new_extra = prefix + 'new'
+        xbox.addExtra(new_extra)
+        xbox.removeDefault(0)
+        items = [*defaults[1:], *extras, new_extra]
+
+        # --- Act ---
+        xbox.onTextEdit(prefix)
+
+        # --- Check ---
+        model = xbox.completer().model()
+        results = [model.index(i, 0).data() for i in range(model.rowCount())]
+        expected = sorted({item for item in items if item.startswith(prefix)})
+        assert results == (expected[:n_completions] if prefix else [])
+
+        # --- End ---
+        xbox.hidePopup()
+        sip.delete(xbox)
+
+    def test_threaded_latest_only(_, ):
+        """Only the newest query's results reach the popup, however queries finish."""
+        # --- Prep ---
+        class SlowFirst(PrefixEngine):
+            def query(self, text, limit):
+                if text == 'a':
+                    time.sleep(0.2)
+                return super().query(text, limit)
+
+        pool = QThreadPool()
+        pool.setMaxThreadCount(2)
+        xbox = ExpandoBox(extras=['ant', 'apple', 'apricot', 'banana'],
+                          completion=SlowFirst(),
+                          completion_pool=pool)
+        applied = list()
+        model = xbox.completer().model()
+        model.modelReset.connect(lambda: applied.append(
+            [model.index(i, 0).data() for i in range(model.rowCount())]))
+
+        # --- Act ---
+        for text in ('a', 'ap', 'apr'):
+            xbox.onTextEdit(text)
+            time.sleep(0.01)
+        pool.waitForDone()
+        QApplication.processEvents()
+
+        # --- Check ---
+        assert applied == [['apricot']]
+
+        # --- End ---
+        xbox.hidePopup()
+        sip.delete(xbox)
+
+    def test_update_during_query(_, ):
+        """Item changes do not wait for an in-flight query; its engine updates follow it."""
+        # --- Prep ---
+        class Slow(PrefixEngine):
+            def query(self, text, limit):
+                time.sleep(0.3)
+                return super().query(text, limit)
+
+        pool = QThreadPool()
+        engine = Slow()
+        xbox = ExpandoBox(extras=['ant', 'apple'],
+                          completion=engine,
+                          completion_pool=pool)
+        xbox.onTextEdit('a')
+        time.sleep(0.05)  # (query started)
+
+        # --- Act ---
+        start = time.perf_counter()
+        xbox.addExtras(['apricot'])
+        xbox.removeExtra('ant')
+        elapsed = time.perf_counter() - start
+
+        # --- Check ---
+        assert elapsed < 0.2
+        assert 'apricot' not in engine  # queued
+        pool.waitForDone()
+        QApplication.processEvents()
+        assert engine.query('a', 10) == ['apple', 'apricot']
+
+        # --- End ---
+        xbox.hidePopup()
+        sip.delete(xbox)
+
+    @given(n_edits = integer_sample(small=True, nonzero=True),
+           debounce_ms = st.sampled_from((0, 20)))
+    def test_debounce(_, n_edits: int,
+                         debounce_ms: int,
+                         ):
+        """A burst of edits is handled once, for the latest text, and reported."""
+        # --- Prep ---
+        xbox = ExpandoBox(extras=['ant', 'apple', 'apricot', 'banana'],
+                          completion=PrefixEngine(),
+                          debounce_ms=debounce_ms)
+        handled = list()
+        coalesced = list()
+        xbox.onTextEdit = handled.append
+        xbox.editsCoalesced.connect(coalesced.append)
+        line_edit = xbox.lineEdit()
+        burst = ['apricot'[:1 + i_edit % 7] for i_edit in range(n_edits)]
+
+        # --- Act ---
+        for text in burst:
+            line_edit.setText(text)
+            line_edit.textEdited.emit(text)
+
+        # --- Check ---
+        assert line_edit.text() == burst[-1]  # echoed immediately
+        assert handled == []
+        QTest.qWait(debounce_ms + 50)
+        assert handled == [burst[-1]]
+        assert coalesced == ([n_edits - 1] if n_edits > 1 else [])
+        assert xbox.nCoalescedEdits == n_edits - 1
+
+        # --- End ---
+        sip.delete(xbox)
+
+    @given(engine = boolean)
+    def test_debounce_filtering(_, engine: bool):
+        """Typed keys do not re-filter the completer until their burst is handled."""
+        # --- Prep ---
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=['ant', 'apple', 'apricot', 'banana'],
+                          completion=PrefixEngine() if engine else None,
+                          debounce_ms=50)
+        xbox.show()
+        completer = xbox.completer()
+        passes = list()
+        completer.completionModel().modelReset.connect(
+            lambda: passes.append(completer.completionPrefix()))
+        line_edit = xbox.lineEdit()
+        line_edit.setFocus()
+
+        # --- Act ---
+        QTest.keyClicks(line_edit, 'apr')
+
+        # --- Check ---
+        assert line_edit.text() == 'apr'  # echoed immediately
+        assert passes == []
+        QTest.qWait(50 + 100)
+        assert 1 <= len(passes) <= 2  # (an engine's new results, then the prefix)
+        assert passes[-1] == 'apr'
+        assert (completer.completionCount(), completer.currentCompletion()) == (1, 'apricot')
+        assert line_edit.text() == 'apr'  # (not completed inline)
+
+        # --- End ---
+        completer.popup().hide()
+        sip.delete(xbox)
+
+    def test_popup_survives_update(_, ):
+        # --- Prep ---
+        xbox = ExpandoBox(defaults=['apple', 'apricot'],
+                          extras=['avocado', 'banana'])
+        xbox.show()
+        completer = xbox.completer()
+        popup = completer.popup()
+        completer.setCompletionPrefix('a')
+        completer.complete()
+        popup.setCurrentIndex(completer.completionModel().index(1, 0))
+
+        # --- Act ---
+        xbox.addExtra('almond')
+        xbox.removeDefault('apple')
+
+        # --- Check ---
+        assert popup.isVisible()
+        assert popup.currentIndex().data() == 'apricot'
+        assert completer.completionCount() == 3
+
+        # --- End ---
+        popup.hide()
+        sip.delete(xbox)
+
 
 
 
@@ -997,11 +1399,12 @@ class TestAddItem_s:
             items = [*defaults, new_default]
 
         # --- Act ---
-        if new_default == default_expander:
-            try:
+        if (new_default == default_expander
+        or (unique and new_default in (*defaults, *extras))):
+            with pytest.raises(ValueError):
                 xbox.addDefault(new_default)
-            except ValueError:
-                return
+            sip.delete(xbox)
+            return
         else:
             xbox.addDefault(new_default)
         
@@ -1090,6 +1493,222 @@ class TestAddItem_s:
         pass
 
 
+class TestUnique:
+    def test_reject(_, ):
+        """Repeats within a batch and of held items are reported together, and nothing is added."""
+        # --- Prep ---
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=['a', 'b'])
+
+        # --- Act ---
+        with pytest.raises(ValueError) as error:
+            xbox.addExtras(['c', 'a', 'c', 'x', 'd'])
+
+        # --- Check ---
+        assert "['a', 'c', 'x']" in str(error.value)
+        assert list(xbox._extras) == ['a', 'b']
+
+        # --- End ---
+        sip.delete(xbox)
+
+    def test_skip(_, ):
+        # --- Prep ---
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=['a', 'b'])
+
+        # --- Act ---
+        xbox.addExtras(['c', 'a', 'c', 'x', 'd'], skip_repeats=True)
+        xbox.addDefaults(['y', 'd'], skip_repeats=True)
+
+        # --- Check ---
+        assert list(xbox._extras) == ['a', 'b', 'c', 'd']
+        assert list(xbox._defaults) == ['x', 'y']
+
+        # --- End ---
+        sip.delete(xbox)
+
+    def test_not_unique(_, ):
+        # --- Prep ---
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=['a'],
+                          unique=False)
+
+        # --- Act ---
+        xbox.addExtras(['a', 'x'])
+
+        # --- Check ---
+        assert list(xbox._extras) == ['a', 'a', 'x']
+
+        # --- End ---
+        sip.delete(xbox)
+
+    def test_catalog(_, ):
+        """A given catalog's uniqueness is the box's, and its initial items are checked."""
+        # --- Prep ---
+        catalogs = [ItemCatalog(['x'], ['a'], unique=unique) for unique in (False, True)]
+        xboxes = [ExpandoBox(catalog=catalog) for catalog in catalogs]
+
+        # --- Act ---
+        xboxes[0].addExtra('a')
+        with pytest.raises(ValueError):
+            xboxes[1].addExtra('a')
+
+        # --- Check ---
+        assert [xbox.uniqueItemText for xbox in xboxes] == [False, True]
+        assert list(catalogs[0].extras) == ['a', 'a']
+        assert list(catalogs[1].extras) == ['a']
+        with pytest.raises(ValueError):
+            ItemCatalog(extras=['a', 'a'], unique=True)
+        with pytest.raises(ValueError):
+            ItemCatalog(defaults=['a'], extras=['a'], unique=True, compact=True)
+
+        # --- End ---
+        for xbox in xboxes:
+            sip.delete(xbox)
+
+
+class TestTimings:
+    def test_recorded(_, ):
+        # --- Prep ---
+        timings = Timings()
+        recorded = list()
+        timings.recorded.connect(lambda *args: recorded.append(args))
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=['a', 'b'],
+                          timings=timings)
+
+        # --- Act ---
+        xbox.onSelect(1)  # expand
+        xbox.onSelect(2)  # select, collapse
+        xbox.addExtras(['c', 'd'])
+
+        # --- Check ---
+        stats = timings.stats
+        assert stats['init'].count == 1
+        assert stats['onSelect'].count == 2
+        assert stats['toggleExtras'].count == 2  # (within onSelect)
+        assert stats['onSelect'].total >= stats['toggleExtras'].total
+        assert stats['addExtras'].items == 5
+        assert stats['addExtras'].max == stats['addExtras'].total > 0
+        assert [args[0] for args in recorded].count('onSelect') == 2
+        assert set(timings.report()) == set(stats)
+
+        # --- End ---
+        sip.delete(xbox)
+
+    def test_opt_in(_, ):
+        # --- Prep ---
+        timings = Timings()
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=['a'])
+
+        # --- Act ---
+        xbox.onSelect(1)
+        xbox.setTimings(timings)
+        xbox.onSelect(1)
+        xbox.setTimings(None)
+        xbox.onSelect(1)
+
+        # --- Check ---
+        assert timings.stats['onSelect'].count == 1
+        assert 'init' not in timings.stats
+
+        # --- End ---
+        sip.delete(xbox)
+
+
+class TestBatchUpdate:
+    @staticmethod
+    def mutate(xbox: ExpandoBox) -> None:
+        xbox.addDefaults(['d1', 'd2'])
+        xbox.addExtras(['e1', 'e2', 'e3'])
+        xbox.removeExtra('a')
+        xbox.removeExtras(['e2'])
+        xbox.removeDefault('d1')
+
+    @staticmethod
+    def signals(model) -> List_T[str]:
+        emitted = list()
+        for name in ('rowsInserted', 'rowsRemoved', 'layoutChanged', 'modelReset'):
+            getattr(model, name).connect(lambda *_, name=name: emitted.append(name))
+        return emitted
+
+    def test_net_effect(_, ):
+        """A batch ends as the same changes made one by one, with one reset per model."""
+        # --- Prep ---
+        kwargs = dict(defaults=['x'], extras=['a', 'b'])
+        xbox, xbox_batched = (ExpandoBox(**kwargs, completion=PrefixEngine())
+                              for _ in range(2))
+        xbox_plain = ExpandoBox(**kwargs)  # QCompleter filters all items
+        emitted = _.signals(xbox_batched._model)
+        emitted_all = _.signals(xbox_plain._allItemsModel)
+
+        # --- Act ---
+        _.mutate(xbox)
+        for box, box_emitted in ((xbox_batched, emitted), (xbox_plain, emitted_all)):
+            with box.batchUpdate():
+                _.mutate(box)
+                assert box_emitted == []
+
+        # --- Check ---
+        rows = [[box.itemText(row) for row in range(box.count())]
+                for box in (xbox, xbox_batched)]
+        assert rows[0] == rows[1] == ['x', 'd2', '...']
+        assert list(xbox._all_items) == list(xbox_batched._all_items)
+        assert (xbox._completion.query('', 10)
+                == xbox_batched._completion.query('', 10)
+                == ['b', 'd2', 'e1', 'e3', 'x'])
+        assert emitted == emitted_all == ['modelReset']
+        assert xbox_plain._allItemsModel.stringList() == list(xbox._all_items)
+
+        # --- End ---
+        sip.delete(xbox)
+        sip.delete(xbox_batched)
+        sip.delete(xbox_plain)
+
+    def test_cancelled(_, ):
+        """Changes that cancel out announce nothing."""
+        # --- Prep ---
+        catalog = ItemCatalog(defaults=['x'], extras=['a'])
+        xboxes = [ExpandoBox(catalog=catalog) for _ in range(2)]
+        emitted = [_.signals(xbox._model) for xbox in xboxes]
+
+        # --- Act ---
+        with xboxes[0].batchUpdate():
+            xboxes[0].addExtras(['b', 'c'])
+            with catalog.batchUpdate():  # nested
+                xboxes[1].addDefault('y')
+            xboxes[1].removeExtras(['b', 'c'])
+            xboxes[0].removeDefault('y')
+
+        # --- Check ---
+        assert emitted == [[], []]
+        assert list(catalog.all_items) == ['x', 'a']
+
+        # --- End ---
+        for xbox in xboxes:
+            sip.delete(xbox)
+
+    def test_history(_, ):
+        """History changed within a batch is reset with the box's model."""
+        # --- Prep ---
+        xbox = ExpandoBox(defaults=['x'], extras=['a', 'b'])
+        xbox.onSelect(1)
+        xbox.onSelect(2)
+        emitted = _.signals(xbox._model)
+
+        # --- Act ---
+        with xbox.batchUpdate():
+            xbox.clearHistory()
+
+        # --- Check ---
+        assert emitted == ['modelReset']
+        assert [xbox.itemText(row) for row in range(xbox.count())] == ['x', '...']
+
+        # --- End ---
+        sip.delete(xbox)
+
+
 class TestRemoveItem_s:
     @skip  # TODO
     @given()
@@ -1155,3 +1774,870 @@ class TestRemoveItem_s:
         # --- End ---
         
         pass
+
+
+class TestModel:
+    @given(n_history=integer_sample(small=True),
+           uniq__defaults__extras = get_items())
+    def test_expand_collapse_ranges(_, n_history: int,
+                                       uniq__defaults__extras: GetItems_T,
+                                       ):
+        """Expansion and collapse each swap the trailing rows as one removal and one insertion."""
+        # --- Prep ---
+        unique, defaults, extras = uniq__defaults__extras
+        xbox = ExpandoBox(defaults=defaults,
+                          extras=extras,
+                          n_history=n_history,
+                          unique=unique)
+        idx_expander = len(defaults)
+        # history
+        xbox.onSelect(idx_expander)
+        xbox.onSelect(idx_expander + 1)
+        n_history_rows = min(n_history, 1)
+        inserted = list()
+        removed = list()
+        model = xbox.model()
+        model.rowsInserted.connect(lambda _, first, last: inserted.append((first, last)))
+        model.rowsRemoved.connect(lambda _, first, last: removed.append((first, last)))
+
+        # --- Act ---
+        xbox.onSelect(idx_expander)
+
+        # --- Check ---
+        assert inserted == [(idx_expander + 1, idx_expander + len(extras))]
+        assert removed == ([(idx_expander + 1, idx_expander + n_history_rows)]
+                           if n_history_rows else [])
+        assert xbox.count() == len(defaults) + 1 + len(extras)
+
+        # --- Act ---
+        inserted.clear()
+        removed.clear()
+        xbox.onSelect(idx_expander)
+
+        # --- Check ---
+        assert removed == [(idx_expander + 1, idx_expander + len(extras))]
+        assert len(inserted) == bool(n_history_rows)
+        assert xbox.count() == len(defaults) + 1 + n_history_rows
+
+        # --- End ---
+        xbox.hidePopup()
+        sip.delete(xbox)
+
+    @given(uniq__defaults__extras = get_items(min_len=0))
+    def test_row_texts(_, uniq__defaults__extras: GetItems_T):
+        # --- Prep ---
+        unique, defaults, extras = uniq__defaults__extras
+        xbox = ExpandoBox(defaults=defaults,
+                          extras=extras,
+                          unique=unique)
+
+        # --- Act ---
+        xbox.toggleExtras()
+
+        # --- Check ---
+        if len(defaults) and len(extras):
+            expected_items = [*defaults, default_expander, *extras]
+        else:
+            expected_items = [*defaults, *extras]
+        assert xbox.count() == len(expected_items)
+        for i_item, item in enumerate(expected_items):
+            assert xbox.itemText(i_item) == item
+
+        # --- End ---
+        sip.delete(xbox)
+
+
+class TestItemIndex:
+    @given(items = st.lists(st.sampled_from('abcdef'), max_size=20),
+           operations = st.lists(st.tuples(boolean,
+                                           st.integers(0, 20),
+                                           st.lists(st.sampled_from('abcdefg'), max_size=5)),
+                                 max_size=10))
+    def test_consistent(_, items: List_T[str],
+                           operations: List_T[Tuple_T[bool, int, List_T[str]]],
+                           ):
+        """Index agrees with a linear scan after any run of insertions|removals."""
+        # --- Prep ---
+        index = ItemIndex(items)
+
+        # --- Act ---
+        for insert, position, texts in operations:
+            position = min(position, len(items))
+            if insert:
+                items[position:position] = texts
+                index.inserted(items, position, len(texts))
+            else:
+                count = min(len(texts), len(items) - position)
+                index.removing(items, range(position, position + count))
+                del items[position:position + count]
+
+        # --- Check ---
+        for text in 'abcdefg':
+            positions = [i_item for i_item, item in enumerate(items) if item == text]
+            assert index.positions(text) == positions
+            assert index.first(text) == (positions[0] if positions else -1)
+            assert (text in index) == bool(positions)
+
+    @given(items = st.lists(st.sampled_from('abcdef'), max_size=30),
+           data = st.data())
+    def test_consistent_scattered(_, items: List_T[str],
+                                     data: st.DataObject,
+                                     ):
+        # --- Prep ---
+        index = ItemIndex(items)
+        positions = sorted(data.draw(st.sets(st.sampled_from(range(len(items)))))) \
+                    if len(items) else []
+
+        # --- Act ---
+        index.removing(items, positions)
+        items = [item for i_item, item in enumerate(items) if i_item not in positions]
+
+        # --- Check ---
+        for text in 'abcdef':
+            assert index.positions(text) == [i_item for i_item, item in enumerate(items) if item == text]
+
+    @given(items = st.lists(st.sampled_from('abcdef'), min_size=1, max_size=30),
+           data = st.data())
+    def test_tombstones(_, items: List_T[str],
+                           data: st.DataObject,
+                           ):
+        """Scattered removals between appends resolve positions through tombstones."""
+        # --- Prep ---
+        index = ItemIndex(items)
+
+        # --- Act & Check ---
+        for _ in range(data.draw(st.integers(1, 6))):
+            if len(items):
+                positions = sorted(data.draw(st.sets(st.sampled_from(range(len(items))),
+                                                     max_size=3)))
+                index.removing(items, positions)
+                items = [item for i_item, item in enumerate(items) if i_item not in positions]
+            appended = data.draw(st.lists(st.sampled_from('abcdef'), max_size=3))
+            items.extend(appended)
+            index.inserted(items, len(items) - len(appended), len(appended))
+            for text in 'abcdef':
+                assert index.positions(text) == [i_item for i_item, item in enumerate(items)
+                                                 if item == text]
+            assert len(index) == len(set(items))
+
+    def test_lazy_tree(_, ):
+        """No per-item tree is held until the first removal."""
+        # --- Prep ---
+        items = tuple(f'item {i}' for i in range(1000))
+        index = ItemIndex(items)
+        index.inserted(items + ('new',), len(items), 1)
+
+        # --- Check ---
+        assert index._tree is None
+
+        # --- Act ---
+        index.removing(items + ('new',), [10])
+
+        # --- Check ---
+        assert index._tree is not None
+        assert index.first('item 11') == 10
+        assert index.first('new') == len(items) - 1
+
+    @given(uniq__defaults__extras = get_items())
+    def test_complete_select(_, uniq__defaults__extras: GetItems_T):
+        # --- Prep ---
+        unique, defaults, extras = uniq__defaults__extras
+        xbox = ExpandoBox(defaults=defaults,
+                          extras=extras,
+                          unique=unique)
+        extra = random.choice(extras)
+        idx_extra = extras.index(extra)
+
+        # --- Act ---
+        xbox.onCompleteSelect(extra)
+
+        # --- Check ---
+        if extra in defaults:
+            assert xbox._previous.index == defaults.index(extra)
+        else:
+            assert xbox._previous.index == len(defaults) + 1 + idx_extra
+            assert xbox.lineEdit().text() == extra
+
+        # --- End ---
+        sip.delete(xbox)
+
+
+class TestRemoveItems:
+    @given(uniq__defaults__extras = get_items(),
+           expand = boolean,
+           by_text = boolean,
+           data = st.data())
+    def test_remove_extras(_, uniq__defaults__extras: GetItems_T,
+                              expand: bool,
+                              by_text: bool,
+                              data: st.DataObject,
+                              ):
+        # --- Prep ---
+        unique, defaults, extras = uniq__defaults__extras
+        xbox = ExpandoBox(defaults=defaults,
+                          extras=extras,
+                          unique=unique)
+        idx_expander = len(defaults)
+        positions = data.draw(st.sets(st.sampled_from(range(len(extras)))))
+        if by_text:
+            selection = [extras[position] for position in positions]
+            kept = [item for item in extras if item not in selection]
+        else:
+            selection = list(positions)
+            kept = [item for position, item in enumerate(extras) if position not in positions]
+        if expand:
+            xbox.onSelect(idx_expander)
+        completer_updates = list()
+        model = xbox.completer().model()
+        model.rowsRemoved.connect(lambda *_: completer_updates.append('rows'))
+        model.layoutChanged.connect(lambda *_: completer_updates.append('layout'))
+
+        # --- Act ---
+        xbox.removeExtras(selection)
+
+        # --- Check ---
+        assert xbox._extras == kept
+        assert xbox._all_items == [*defaults, *kept]
+        assert len(completer_updates) == bool(len(kept) < len(extras))
+        if len(kept):
+            expected_items = [*defaults, default_expander, *(kept if expand else ())]
+        else:
+            expected_items = defaults
+        assert xbox.count() == len(expected_items)
+        for i_item, item in enumerate(expected_items):
+            assert xbox.itemText(i_item) == item
+        for text in set(kept):
+            assert xbox._model.find('extras', text) == kept.index(text)
+
+        # --- End ---
+        sip.delete(xbox)
+
+    @given(uniq__defaults__extras = get_items())
+    def test_remove_predicate(_, uniq__defaults__extras: GetItems_T):
+        # --- Prep ---
+        unique, defaults, extras = uniq__defaults__extras
+        xbox = ExpandoBox(defaults=defaults,
+                          extras=extras,
+                          unique=unique)
+        predicate = lambda item: len(item) % 2 == 0
+
+        # --- Act ---
+        xbox.removeDefaults(predicate)
+
+        # --- Check ---
+        kept = [item for item in defaults if not predicate(item)]
+        assert xbox._defaults == kept
+        assert xbox._all_items == [*kept, *extras]
+
+        # --- End ---
+        sip.delete(xbox)
+
+    def test_remove_history(_, ):
+        # --- Prep ---
+        extras = ['a', 'b', 'c', 'd']
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=extras)
+        for idx_extra in (0, 2, 3):
+            xbox.onSelect(1)
+            xbox.onSelect(2 + idx_extra)
+
+        # --- Act ---
+        xbox.removeExtras(['a', 3])
+
+        # --- Check ---
+        for i_item, item in enumerate(('x', default_expander, 'c')):
+            assert xbox.itemText(i_item) == item
+        assert xbox.count() == 3
+
+        # --- End ---
+        sip.delete(xbox)
+
+
+class TestFetchExtras:
+    @given(n_fetch=integer_sample(small=True, nonzero=True),
+           n_extras=st.integers(min_value=0, max_value=50))
+    def test_callable(_, n_fetch: int, n_extras: int):
+        """Pages are pulled only as the displayed extras are scrolled to their end."""
+        # --- Prep ---
+        calls = list()
+        def provider(offset, limit):
+            calls.append((offset, limit))
+            return [f'extra {i}' for i in range(offset, min(offset + limit, n_extras))]
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=provider,
+                          n_fetch_extras=n_fetch,
+                          completion=PrefixEngine())
+        model = xbox.model()
+        root = QModelIndex()
+
+        # --- Check ---
+        assert calls == [(0, n_fetch)]
+        assert len(xbox._extras) == min(n_fetch, n_extras)
+        assert not model.canFetchMore(root)  # collapsed
+
+        # --- Act ---
+        xbox.toggleExtras()
+        while model.canFetchMore(root):
+            model.fetchMore(root)
+
+        # --- Check ---
+        assert xbox._extras == [f'extra {i}' for i in range(n_extras)]
+        assert len(calls) == n_extras // n_fetch + 1
+        assert xbox.count() == 1 + bool(n_extras) + n_extras
+        if n_extras:
+            assert xbox._completion.query(f'extra {n_extras - 1}', 1) == [f'extra {n_extras - 1}']
+
+        # --- End ---
+        sip.delete(xbox)
+
+    def test_iterator(_, ):
+        # --- Prep ---
+        extras = (f'extra {i}' for i in range(1_000_000))
+        xbox = ExpandoBox(extras=extras,
+                          n_fetch_extras=10)
+        model = xbox.model()
+        root = QModelIndex()
+
+        # --- Check ---
+        assert xbox.count() == 10
+        assert model.canFetchMore(root)  # extras only
+
+        # --- Act ---
+        model.fetchMore(root)
+
+        # --- Check ---
+        assert xbox.count() == 20
+        assert xbox.itemText(12) == 'extra 12'
+        assert next(extras) == 'extra 20'
+
+        # --- End ---
+        sip.delete(xbox)
+
+
+async def settle(n_passes: int = 5) -> None:
+    """Alternate asyncio and Qt event processing, as an integrated loop would."""
+    for _ in range(n_passes):
+        await asyncio.sleep(0)
+        QApplication.processEvents()
+
+
+class TestAsync:
+    def test_extras(_, ):
+        """Async pages arrive on later passes of the loop, one fetch at a time."""
+        # --- Prep ---
+        calls = list()
+        pending = list()
+        async def provider(offset, limit):
+            calls.append(offset)
+            pending.append(offset)
+            assert len(pending) == 1  # one fetch at a time
+            await asyncio.sleep(0)
+            pending.remove(offset)
+            return [f'extra {i}' for i in range(offset, min(offset + limit, 25))]
+
+        async def main():
+            xbox = ExpandoBox(defaults=['x'],
+                              extras=provider,
+                              n_fetch_extras=10)
+            model = xbox.model()
+            root = QModelIndex()
+
+            # --- Check ---
+            assert xbox.count() == 1  # first page pending
+            await settle()
+            assert xbox.count() == 2
+            assert len(xbox._extras) == 10
+
+            # --- Act ---
+            xbox.toggleExtras()
+            model.fetchMore(root)
+            model.fetchMore(root)  # already pending
+
+            # --- Check ---
+            assert not model.canFetchMore(root)
+            await settle()
+            for _ in range(3):
+                model.fetchMore(root)
+                await settle()
+            assert calls == [0, 10, 20]
+            assert xbox._extras == [f'extra {i}' for i in range(25)]
+            assert not model.canFetchMore(root)
+
+            # --- End ---
+            sip.delete(xbox)
+
+        # --- Act ---
+        asyncio.run(main())
+
+    def test_completion_latest_only(_, ):
+        """A superseded query is cancelled; only the latest results are shown."""
+        # --- Prep ---
+        cancelled = list()
+        async def query(text, limit):
+            try:
+                await asyncio.sleep(0.05 if text == 'a' else 0)
+            except asyncio.CancelledError:
+                cancelled.append(text)
+                raise
+            return [f'{text} 1', f'{text} 2']
+
+        async def main():
+            xbox = ExpandoBox(defaults=['x'],
+                              completion=query)
+
+            # --- Act ---
+            xbox.onTextEdit('a')
+            await asyncio.sleep(0)  # started
+            xbox.onTextEdit('ab')
+            await settle()
+
+            # --- Check ---
+            assert cancelled == ['a']
+            assert xbox._completionsModel.items == ['ab 1', 'ab 2']
+
+            # --- End ---
+            sip.delete(xbox)
+
+        # --- Act ---
+        asyncio.run(main())
+
+    def test_lazy_import(_, ):
+        """Boxes without async sources or a history store load neither asyncio nor sqlite3."""
+        # --- Prep ---
+        script = textwrap.dedent("""
+            import os, sys
+            os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+            from qtpy.QtWidgets import QApplication, QCompleter
+            from pycuties import ExpandoBox, PrefixEngine
+            app = QApplication([])
+
+            xbox = ExpandoBox(defaults=['x'], extras=['a', 'b'],
+                              completion=PrefixEngine(), n_history=3)
+            xbox.onSelect(1)  # expand
+            xbox.onSelect(2)  # select
+            xbox.onTextEdit('a')
+            print(' '.join(name for name in ('asyncio', 'inspect', 'sqlite3', 'json')
+                           if name in sys.modules))
+            """)
+
+        # --- Act ---
+        process = subprocess.run([sys.executable, '-c', script],
+                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                 universal_newlines=True, timeout=120)
+
+        # --- Check ---
+        assert process.returncode == 0, process.stderr
+        assert process.stdout.strip() == ''
+
+
+class TestIcon:
+    @given(ratio=st.sampled_from((1.0, 1.5, 2.0)))
+    def test_cached(_, ratio: float):
+        # --- Act ---
+        icon = get_icon(clock, 10, ratio)
+
+        # --- Check ---
+        assert get_icon(clock, 10, ratio) is icon
+        size, = icon.availableSizes()  # physical pixels
+        assert size.width() == size.height() == round(10 * ratio)
+
+    def test_shared(_, ):
+        # --- Act ---
+        xboxes = [ExpandoBox(defaults=['x'], extras=['a']) for _ in range(3)]
+
+        # --- Check ---
+        assert all(xbox.clock_icon is xboxes[0].clock_icon
+                   for xbox in xboxes)
+
+        # --- End ---
+        for xbox in xboxes:
+            sip.delete(xbox)
+
+    def test_unowned_box(_, ):
+        """A box owned by nothing is freed once dropped, not whilst its icon is first painted."""
+        # --- Prep ---
+        script = textwrap.dedent("""
+            import os
+            os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+            from qtpy.QtWidgets import QApplication, QCompleter
+            from pycuties import ExpandoBox
+            app = QApplication([])
+
+            def select():
+                xbox = ExpandoBox(defaults=['x'], extras=[f'e {i}' for i in range(200)],
+                                  n_history=100)
+                for i_extra in range(120):
+                    xbox.onSelect(1)  # expand
+                    xbox.onSelect(2 + i_extra)  # select, collapse (history row)
+
+            select()
+            ExpandoBox(defaults=['x'], extras=['a']).onSelect(1)
+            print('done')
+            """)
+
+        # --- Act ---
+        process = subprocess.run([sys.executable, '-c', script],
+                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                 universal_newlines=True, timeout=120)
+
+        # --- Check ---
+        assert process.returncode == 0, process.stderr
+        assert process.stdout.strip() == 'done'
+        assert 'Cannot destroy paint device' not in process.stderr
+
+
+class TestCatalog:
+    @given(uniq__defaults__extras = get_items())
+    def test_shared(_, uniq__defaults__extras: GetItems_T):
+        """Attached boxes share items, and each sees a catalog change as one row range."""
+        # --- Prep ---
+        _, defaults, extras = uniq__defaults__extras
+        catalog = ItemCatalog(defaults=list(defaults),
+                              extras=list(extras),
+                              completion=PrefixEngine())
+        xboxes = [ExpandoBox(catalog=catalog) for _ in range(3)]
+        xboxes[0].toggleExtras()  # expanded
+        inserted = list()
+        for xbox in xboxes:
+            xbox.model().rowsInserted.connect(
+                lambda _, first, last, xbox=xbox: inserted.append((xbox, first, last)))
+        new = [f'new {i}' for i in range(3)]
+
+        # --- Act ---
+        catalog.addExtras(new)
+
+        # --- Check ---
+        n_defaults = len(defaults)
+        n_extras = len(extras)
+        idx_new = n_defaults + 1 + n_extras
+        assert inserted == [(xboxes[0], idx_new, idx_new + 2)]  # hidden elsewhere
+        for xbox in xboxes:
+            assert xbox._all_items is catalog.all_items
+            assert xbox._all_items == [*defaults, *extras, *new]
+        assert xboxes[0].count() == n_defaults + 1 + n_extras + 3
+        assert xboxes[1].count() == n_defaults + 1
+        assert catalog.completion.query('new', 5) == new
+
+        # --- End ---
+        for xbox in xboxes:
+            sip.delete(xbox)
+
+    def test_history(_, ):
+        """Each box has its own history, and loses removed extras from it."""
+        # --- Prep ---
+        catalog = ItemCatalog(defaults=['x'],
+                              extras=['a', 'b', 'c'])
+        xboxes = [ExpandoBox(catalog=catalog) for _ in range(2)]
+        for xbox, idx_extra in zip(xboxes, (0, 1)):
+            xbox.onSelect(1)
+            xbox.onSelect(2 + idx_extra)
+
+        # --- Check ---
+        assert [xbox.itemText(2) for xbox in xboxes] == ['a', 'b']
+
+        # --- Act ---
+        xboxes[1].removeExtras(['b'])
+
+        # --- Check ---
+        assert list(xboxes[0]._history_extras) == ['a']
+        assert list(xboxes[1]._history_extras) == []
+        assert [xbox.count() for xbox in xboxes] == [3, 2]
+
+        # --- End ---
+        for xbox in xboxes:
+            sip.delete(xbox)
+        assert catalog.models == []
+
+    def test_verify(_, ):
+        # --- Prep ---
+        catalog = ItemCatalog(extras=['a', '...'])
+
+        # --- Act & Check ---
+        with pytest.raises(ValueError):
+            ExpandoBox(catalog=catalog)
+        with pytest.raises(ValueError):
+            ExpandoBox(catalog=catalog, expander='>', defaults=['x'])
+
+
+class TestCompact:
+    @given(uniq__defaults__extras = get_items(),
+           n_removed = st.integers(0, 3))
+    def test_equivalent(_, uniq__defaults__extras: GetItems_T, n_removed: int):
+        """A compact box shows and finds the same items as a regular one."""
+        # --- Prep ---
+        unique, defaults, extras = uniq__defaults__extras
+        xboxes = [ExpandoBox(defaults=defaults,
+                             extras=extras,
+                             unique=unique,
+                             compact=compact)
+                  for compact in (False, True)]
+
+        # --- Act ---
+        for xbox in xboxes:
+            xbox.onSelect(len(defaults))  # expand
+            xbox.addExtras(['new'])
+            xbox.removeExtras(range(n_removed))
+            xbox.addDefault('first')
+
+        # --- Check ---
+        regular, compact = xboxes
+        assert compact.count() == regular.count()
+        for i_item in range(regular.count()):
+            assert compact.itemText(i_item) == regular.itemText(i_item)
+        assert compact._all_items == regular._all_items
+        for text in {*defaults, *extras, 'new', 'first'}:
+            for segment in ('defaults', 'extras'):
+                assert compact._model.find(segment, text) == regular._model.find(segment, text)
+
+        # --- End ---
+        for xbox in xboxes:
+            sip.delete(xbox)
+
+
+class TestZeroCopy:
+    @given(uniq__defaults__extras = get_items())
+    def test_tuple(_, uniq__defaults__extras: GetItems_T):
+        """Tuples are held as given, and copied only when the box changes them."""
+        # --- Prep ---
+        unique, defaults, extras = uniq__defaults__extras
+        defaults = tuple(defaults)
+        extras = tuple(extras)
+        xbox = ExpandoBox(defaults=defaults,
+                          extras=extras,
+                          unique=unique)
+
+        # --- Check ---
+        assert xbox._defaults is defaults
+        assert xbox._extras is extras
+
+        # --- Act ---
+        xbox.toggleExtras()
+        xbox.addExtra('new')
+
+        # --- Check ---
+        assert xbox._defaults is defaults
+        assert xbox._extras == [*extras, 'new']
+        assert xbox._all_items == [*defaults, *extras, 'new']
+        assert xbox.itemText(xbox.count() - 1) == 'new'
+
+        # --- End ---
+        sip.delete(xbox)
+
+    def test_list_copied(_, ):
+        # --- Prep ---
+        extras = ['a', 'b']
+        xbox = ExpandoBox(defaults=['x'], extras=extras)
+
+        # --- Act ---
+        extras.append('c')
+
+        # --- Check ---
+        assert xbox._extras == ['a', 'b']
+
+        # --- End ---
+        sip.delete(xbox)
+
+    def test_frozen(_, ):
+        """Boxes share a frozen catalog's tuples, which cannot change."""
+        # --- Prep ---
+        extras = tuple(f'extra {i}' for i in range(1000))
+        catalog = FrozenCatalog(defaults=('x',), extras=extras)
+        xboxes = [ExpandoBox(catalog=catalog) for _ in range(2)]
+
+        # --- Check ---
+        assert all(xbox._extras is extras for xbox in xboxes)
+
+        # --- Act & Check ---
+        with pytest.raises(TypeError):
+            xboxes[0].addExtra('new')
+        with pytest.raises(TypeError):
+            xboxes[1].removeExtras([0])
+        assert xboxes[0].count() == xboxes[1].count() == 2
+
+        # --- End ---
+        for xbox in xboxes:
+            sip.delete(xbox)
+
+
+class TestPopupView:
+    def test_uniform_rows(_, ):
+        # --- Prep ---
+        xbox = ExpandoBox(defaults=['x', 'y'],
+                          extras=['a', 'b', 'c'])
+        view = xbox.view()
+
+        # --- Act ---
+        xbox.onSelect(2)  # expand
+        xbox.onSelect(xbox.findText('b'))  # select, collapse (history row, with icon)
+
+        # --- Check ---
+        assert isinstance(view, PopupView)
+        assert view.uniformItemSizes()
+        assert not xbox.itemIcon(xbox.findText('b')).isNull()
+        heights = {view.sizeHintForRow(row) for row in range(xbox.count())}
+        assert len(heights) == 1 and heights.pop() > 0
+
+        # --- End ---
+        sip.delete(xbox)
+
+    def test_show_many(_, ):
+        # --- Prep ---
+        n_defaults = 10_000
+        xbox = ExpandoBox(defaults=[f'x {i}' for i in range(n_defaults)],
+                          extras=['a', 'b'])
+        n_visible = xbox.maxVisibleItems()
+
+        # --- Act ---
+        xbox.showPopup()
+        shown = xbox.view().isVisible()
+        xbox.hidePopup()
+
+        # --- Check ---
+        assert shown
+        assert n_visible == n_defaults + 1 + 5
+        assert xbox.maxVisibleItems() == n_visible  # (only fitted whilst shown)
+        assert xbox._nScreenRows() < n_visible
+
+        # --- End ---
+        sip.delete(xbox)
+
+
+class TestGroups:
+    def test_lazy_rows(_, ):
+        # --- Prep ---
+        extras = {'vendor a': [f'a {i}' for i in range(1000)],
+                  'vendor b': ['b 0', 'b 1'],
+                  'vendor c': [f'c {i}' for i in range(1000)]}
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=extras,
+                          completion=PrefixEngine())
+        texts = lambda: [xbox.itemText(row) for row in range(xbox.count())]
+
+        # --- Act & Check ---
+        xbox.onSelect(1)  # expand: headers only
+        assert texts() == ['x', '...', 'vendor a', 'vendor b', 'vendor c']
+        xbox.onSelect(xbox.findText('vendor b'))  # open one group
+        assert texts() == ['x', '...', 'vendor a', 'vendor b', 'b 0', 'b 1', 'vendor c']
+        xbox.updateCompletions('c 99')  # completion searches closed groups too
+        model = xbox._completionsModel
+        assert {model.data(model.index(row)) for row in range(model.rowCount())} \
+            == {'c 99', *(f'c {i}' for i in range(990, 1000))}
+        xbox.onSelect(xbox.findText('vendor b'))  # close
+        assert xbox.count() == 5
+
+        # --- End ---
+        sip.delete(xbox)
+
+    def test_history(_, ):
+        # --- Prep ---
+        xbox = ExpandoBox(defaults=['x'],
+                          extras={'a': ['p', 'q'], 'b': ['q', 'r']},
+                          unique=False)
+
+        # --- Act ---
+        xbox.onSelect(1)  # expand
+        xbox.onSelect(xbox.findText('b'))  # open
+        xbox.onSelect(xbox.findText('b') + 1)  # select 'q', of group b (collapse)
+        xbox.onSelect(1)  # expand: groups closed again
+
+        # --- Check ---
+        assert list(xbox._history_extras.items()) == [(1 + 1 + 2, 'q')]  # (as if ungrouped)
+        assert xbox.count() == 4
+
+        # --- End ---
+        sip.delete(xbox)
+
+    def test_change(_, ):
+        # --- Prep ---
+        xbox = ExpandoBox(defaults=['x'],
+                          extras={'a': ['p'], 'b': ['q']})
+        texts = lambda: [xbox.itemText(row) for row in range(xbox.count())]
+        xbox.onSelect(1)  # expand
+        xbox.toggleGroup('a')
+
+        # --- Act ---
+        xbox.addExtras(['s'], group='a')
+        xbox.addExtras(['t'], group='c')  # new group
+        xbox.removeExtra('p')
+        ungrouped = ExpandoBox(extras=['p'])
+        with pytest.raises(ValueError):
+            ungrouped.addExtras(['s'], group='a')
+
+        # --- Check ---
+        assert texts() == ['x', '...', 'a', 's', 'b', 'c']
+        assert xbox._catalog.groups.sizes == [1, 1, 1]
+
+        # --- End ---
+        sip.delete(xbox)
+        sip.delete(ungrouped)
+
+
+class TestPaged:
+    def test_pages(_, ):
+        # --- Prep ---
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=[f'e {i}' for i in range(7)],
+                          n_show_extras=3,
+                          paged=True)
+        texts = lambda: [xbox.itemText(row) for row in range(xbox.count())]
+
+        # --- Act & Check ---
+        xbox.onSelect(1)  # expand: first page
+        assert texts() == ['x', '...', 'e 0', 'e 1', 'e 2', 'more…']
+        xbox.onSelect(5)  # next page
+        assert texts()[2:] == ['e 0', 'e 1', 'e 2', 'e 3', 'e 4', 'e 5', 'more…']
+        xbox.onSelect(8)  # last page (no more)
+        assert texts()[2:] == [f'e {i}' for i in range(7)]
+        xbox.onSelect(1)  # collapse
+        xbox.onSelect(1)  # expand: first page again
+        assert xbox.count() == 6
+
+        # --- End ---
+        sip.delete(xbox)
+
+    def test_history(_, ):
+        # --- Prep ---
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=['a', 'b', 'a', 'c'],
+                          n_show_extras=2,
+                          unique=False,
+                          paged=True)
+
+        # --- Act ---
+        xbox.onSelect(1)  # expand
+        xbox.onSelect(4)  # more
+        xbox.onSelect(4)  # select second 'a' (collapse)
+
+        # --- Check ---
+        key, text = next(xbox._history_extras.items())
+        assert (key, text) == (4, 'a')
+        assert xbox._isExtra(key, text)
+
+        # --- End ---
+        sip.delete(xbox)
+
+    def test_provider(_, ):
+        # --- Prep ---
+        xbox = ExpandoBox(defaults=['x'],
+                          extras=(f'e {i}' for i in range(5)),
+                          n_show_extras=3,
+                          n_fetch_extras=1,
+                          paged=True)
+
+        # --- Act & Check ---
+        xbox.onSelect(1)  # expand: first page fetched
+        assert [xbox.itemText(row) for row in range(2, xbox.count())] \
+            == ['e 0', 'e 1', 'e 2', 'more…']
+        xbox.onSelect(5)  # next (last) page, fetched
+        assert [xbox.itemText(row) for row in range(2, xbox.count())] \
+            == [f'e {i}' for i in range(5)]
+
+        # --- End ---
+        sip.delete(xbox)
+
+    def test_verify(_, ):
+        with pytest.raises(ValueError):
+            ExpandoBox(extras={'a': ['p']}, paged=True)
+        with pytest.raises(ValueError):
+            ExpandoBox(extras=['p'], n_show_extras=0, paged=True)
+
@@ -0,0 +1,231 @@
+"""
+
+TODO:
+    - docstrings
+"""
+
+# stdlib
+from collections import deque as deck
+# local
+from pycuties.storage import ItemStore, CompactIndex, ItemChain, History, ItemGroups
+from pycuties.expandobox import get_runs, compact
+
+# testing
+from hypothesis import (given,
+                        strategies as st,)
+# type hinting
+from typing import (List as List_T,
+                    Tuple as Tuple_T)
+
+
+# --- Utility ---
+
+# hypothesis
+text = st.sampled_from(('a', 'bé', '', 'cc', '€x'))
+texts = st.lists(text, max_size=20)
+operation = st.tuples(st.booleans(),
+                      st.integers(0, 20),
+                      texts)
+
+
+# --- Tests ---
+
+class TestItemStore:
+    @given(items = texts,
+           operations = st.lists(operation, max_size=10))
+    def test_list_like(_, items: List_T[str],
+                          operations: List_T[Tuple_T[bool, int, List_T[str]]],
+                          ):
+        """Store and index agree with a list after any run of insertions|removals."""
+        # --- Prep ---
+        store = ItemStore(items)
+        index = CompactIndex(store)
+
+        # --- Act ---
+        for insert, position, new in operations:
+            position = min(position, len(items))
+            if insert:
+                items[position:position] = new
+                store[position:position] = new
+                index.inserted(store, position, len(new))
+            else:
+                count = min(len(new), len(items) - position)
+                index.removing(store, range(position, position + count))
+                del items[position:position + count]
+                del store[position:position + count]
+
+        # --- Check ---
+        assert store == items
+        assert list(store) == items
+        assert len(index) == len(set(items))  # distinct texts
+        for text in ('a', 'bé', '', 'cc', '€x', 'zz'):
+            positions = [i_item for i_item, item in enumerate(items) if item == text]
+            assert index.positions(text) == positions
+            assert index.first(text) == (positions[0] if positions else -1)
+
+    @given(items = st.lists(text, min_size=1, max_size=30),
+           data = st.data())
+    def test_tombstones(_, items: List_T[str],
+                           data: st.DataObject,
+                           ):
+        """Scattered removals between appends resolve positions through tombstones."""
+        # --- Prep ---
+        store = ItemStore(items)
+        index = CompactIndex(store)
+
+        # --- Act & Check ---
+        for _ in range(data.draw(st.integers(1, 6))):
+            if len(items):
+                positions = sorted(data.draw(st.sets(st.sampled_from(range(len(items))),
+                                                     max_size=3)))
+                index.removing(store, positions)
+                store.deleteRuns(get_runs(positions))
+                items = [item for i_item, item in enumerate(items) if i_item not in positions]
+            appended = data.draw(texts)
+            items.extend(appended)
+            store.extend(appended)
+            index.inserted(store, len(store) - len(appended), len(appended))
+            for text in ('a', 'bé', '', 'cc', '€x'):
+                assert index.positions(text) == [i_item for i_item, item in enumerate(items)
+                                                 if item == text]
+            assert len(index) == len(set(items))
+
+    @given(items = texts,
+           data = st.data())
+    def test_delete_runs(_, items: List_T[str],
+                            data: st.DataObject,
+                            ):
+        # --- Prep ---
+        store = ItemStore(items)
+        index = CompactIndex(store)
+        positions = sorted(data.draw(st.sets(st.sampled_from(range(len(items)))))) \
+                    if len(items) else []
+
+        # --- Act ---
+        index.removing(store, positions)
+        store.deleteRuns(get_runs(positions))
+        items = [item for i_item, item in enumerate(items) if i_item not in positions]
+
+        # --- Check ---
+        assert store == items
+        assert len(index) == len(set(items))  # distinct texts
+        for text in ('a', 'bé', '', 'cc', '€x'):
+            assert index.positions(text) == [i_item for i_item, item in enumerate(items) if item == text]
+
+    @given(items = st.lists(text, max_size=40),
+           data = st.data())
+    def test_compact(_, items: List_T[str],
+                        data: st.DataObject,
+                        ):
+        """Runs are deleted alike in place (few) or by one copy (many), from lists and stores."""
+        # --- Prep ---
+        positions = sorted(data.draw(st.sets(st.sampled_from(range(len(items)))))) \
+                    if len(items) else []
+        kept = [item for i_item, item in enumerate(items) if i_item not in positions]
+        store = ItemStore(items)
+
+        # --- Act ---
+        compact(items, get_runs(positions))
+        compact(store, get_runs(positions))
+
+        # --- Check ---
+        assert items == kept
+        assert store == kept
+
+    @given(defaults = texts, extras = texts)
+    def test_chain(_, defaults: List_T[str], extras: List_T[str]):
+        # --- Act ---
+        chain = ItemChain(ItemStore(defaults), extras)
+
+        # --- Check ---
+        assert chain == [*defaults, *extras]
+        assert [chain[i_item] for i_item in range(len(chain))] == [*defaults, *extras]
+
+
+class TestHistory:
+    @given(maxlen = st.integers(0, 5),
+           selected = st.lists(text, max_size=20))
+    def test_deque_like(_, maxlen: int, selected: List_T[str]):
+        """Pushing only absent texts matches a bounded deque's appendleft."""
+        # --- Prep ---
+        history = History(maxlen)
+        recent = deck([], maxlen=maxlen)
+
+        # --- Act ---
+        for text in selected:
+            if text not in history:
+                history.appendleft(text)
+            if text not in recent:
+                recent.appendleft(text)
+
+        # --- Check ---
+        assert list(history) == list(recent)
+        assert [history[row] for row in range(len(history))] == list(recent)
+        for row, text in enumerate(recent):
+            assert history.row(text) == row
+
+    def test_move_remove(_):
+        # --- Prep ---
+        history = History(3)
+        for key, text in enumerate('abc'):
+            history.appendleft(text, key)
+
+        # --- Act & Check ---
+        history.appendleft('a', 0)  # move to front
+        assert list(history) == ['a', 'c', 'b']
+        history.appendleft('d', 3)  # evicts oldest
+        assert list(history.items()) == [(3, 'd'), (0, 'a'), (2, 'c')]
+        history.remove(0)
+        assert list(history) == ['d', 'c']
+        assert 0 not in history and 2 in history
+
+    @given(maxlen = st.integers(1, 5),
+           pushed = st.lists(st.tuples(st.sampled_from(('appendleft', 'append', 'remove')),
+                                       text),
+                             min_size=1, max_size=20))
+    def test_end_rows(_, maxlen: int, pushed: List_T[Tuple_T[str, str]]):
+        """Rows of the newest and oldest, read before any other, match the rebuilt rows."""
+        # --- Prep ---
+        history = History(maxlen)
+
+        for method, text in pushed:
+            # --- Act ---
+            if method != 'remove':
+                getattr(history, method)(text)
+            elif text in history:
+                history.remove(text)
+            if not len(history):
+                continue
+
+            # --- Check ---
+            newest, oldest = next(iter(history)), history.oldest()
+            n_history = len(history)
+            assert history.row(newest) == 0
+            assert history.row(oldest) == n_history - 1
+            assert history.keys()[0] == newest
+            assert history.keys()[-1] == oldest
+
+
+class TestItemGroups:
+    @given(sizes = st.lists(st.integers(0, 4), min_size=1, max_size=6),
+           removed = st.sets(st.integers(0, 23)))
+    def test_group_removing(_, sizes: List_T[int], removed: List_T[int]):
+        """Groups of positions match a flat list of group numbers, before and after removal."""
+        # --- Prep ---
+        groups = ItemGroups(map(str, range(len(sizes))), sizes)
+        flat = [i_group for i_group, size in enumerate(sizes) for _ in range(size)]
+        removed = sorted(position for position in removed if position < len(flat))
+
+        # --- Act & Check ---
+        assert [groups.group(position) for position in range(len(flat))] == flat
+        version = groups.version
+        groups.removing(removed)
+        for position in reversed(removed):
+            del flat[position]
+        assert [groups.group(position) for position in range(len(flat))] == flat
+        assert sum(groups.sizes) == len(flat)
+        assert groups.version > version
+        for i_group in range(len(groups)):
+            start, stop = groups.span(i_group)
+            assert flat[start:stop] == [i_group] * groups.sizes[i_group]
+